@@ -15,69 +15,261 @@ The web interface will be available at http://localhost:5000
 
 import argparse
 import os
+import secrets
 import sys
 import shutil
+import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from functools import lru_cache
 
-from flask import Flask
-from flask_socketio import SocketIO
 
-from core import ProfileManager, StorageManager, ExperimentEngine, init_sync
-from web.routes import web, init_routes
+# Directory containing this script. __file__ is already absolute on
+# Python 3.9+, so abspath (and its getcwd()) is only needed before that.
+_HERE = os.path.dirname(__file__ if os.path.isabs(__file__) else os.path.abspath(__file__))
+
+# Startup banner, printed only when stdout is a terminal
+BANNER = """
+╔═══════════════════════════════════════════════════════════════╗
+║                                                               ║
+║   ECR - Experiment Control & Record                          ║
+║   Multi-User Collaborative Mode (WebSocket)                   ║
+║                                                               ║
+║   Web Interface: http://{host}:{port:<5}                        ║
+║                                                               ║
+║   Profiles: {profiles_dir:<43} ║
+║   Runs:     {runs_dir:<43} ║
+║                                                               ║
+║   Share URL with team members to collaborate in real-time!    ║
+║   Press Ctrl+C to stop                                        ║
+║                                                               ║
+╚═══════════════════════════════════════════════════════════════╝
+"""
 
 
+@lru_cache(maxsize=None)
 def get_resource_path(relative_path):
     """Get absolute path to resource, works for dev and PyInstaller."""
     if hasattr(sys, '_MEIPASS'):
         # PyInstaller creates a temp folder and stores path in _MEIPASS
         return os.path.join(sys._MEIPASS, relative_path)
-    return os.path.join(os.path.dirname(os.path.abspath(__file__)), relative_path)
+    return os.path.join(_HERE, relative_path)
 
 
+@lru_cache(maxsize=None)
 def get_base_dir():
     """Get the base directory for bundled resources."""
     if hasattr(sys, '_MEIPASS'):
         return sys._MEIPASS
-    return os.path.dirname(os.path.abspath(__file__))
+    return _HERE
 
 
+@lru_cache(maxsize=None)
 def get_working_dir():
     """Get the working directory for user data (profiles, runs)."""
     # When running as binary, use current working directory
     # When running as script, use script directory
     if hasattr(sys, '_MEIPASS'):
         return os.getcwd()
-    return os.path.dirname(os.path.abspath(__file__))
+    return _HERE
+
+
+def _sendfile_copy(src, dst, size):
+    """Copy src to dst in-kernel with os.sendfile, preserving timestamps."""
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        st = os.fstat(src_fd)
+        dst_fd = _open_copy_dest(dst, st)
+        try:
+            offset = 0
+            while offset < size:
+                sent = os.sendfile(dst_fd, src_fd, offset, size - offset)
+                if sent == 0:
+                    break
+                offset += sent
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _open_copy_dest(dst, src_stat):
+    """Open dst for a copy with src's permission bits, as shutil.copy2 would."""
+    mode = src_stat.st_mode & 0o777
+    dst_fd = os.open(dst, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, mode)
+    # The create mode is filtered by the umask; copy2 sets it exactly
+    os.fchmod(dst_fd, mode)
+    return dst_fd
+
+
+@lru_cache(maxsize=None)
+def get_default_dir(name):
+    """Get the default user-data directory `name` under the working directory."""
+    return os.path.join(get_working_dir(), name)
+
+
+def _ensure_dir(path):
+    """Create a directory if missing; one mkdir() on the common path."""
+    try:
+        os.mkdir(path)
+    except FileExistsError:
+        pass
+    except FileNotFoundError:
+        # Missing parents
+        os.makedirs(path, exist_ok=True)
+
+
+def _is_empty(path):
+    """Return True if the directory has no entries (reads at most one)."""
+    with os.scandir(path) as it:
+        return next(it, None) is None
+
+
+# Cache lifetime for /static assets. Asset URLs are not fingerprinted, so
+# keep this short enough that upgrades reach browsers within the hour.
+STATIC_MAX_AGE = 3600
+
+# Responses smaller than this are sent uncompressed
+COMPRESS_MIN_SIZE = 1024
+
+# Sample profile file extensions copied on first start
+_YAML_SUFFIXES = ('.yaml', '.yml')
+
+# ioctl request number for a copy-on-write clone (Linux FICLONE)
+_FICLONE = 0x40049409
+
+
+def _reflink_copy(src, dst):
+    """Clone src into dst with FICLONE; raises OSError if unsupported."""
+    import fcntl
+    
+    src_fd = os.open(src, os.O_RDONLY)
+    try:
+        st = os.fstat(src_fd)
+        dst_fd = _open_copy_dest(dst, st)
+        try:
+            fcntl.ioctl(dst_fd, _FICLONE, src_fd)
+        finally:
+            os.close(dst_fd)
+    finally:
+        os.close(src_fd)
+    os.utime(dst, ns=(st.st_atime_ns, st.st_mtime_ns))
+
+
+def _buffered_copy(src, dst, bufsize=1 << 18):
+    """Userspace copy with a 256 KiB buffer and sequential readahead hint."""
+    with open(src, 'rb', buffering=0) as fsrc, open(dst, 'wb', buffering=0) as fdst:
+        if hasattr(os, 'posix_fadvise'):
+            os.posix_fadvise(fsrc.fileno(), 0, 0, os.POSIX_FADV_SEQUENTIAL)
+        shutil.copyfileobj(fsrc, fdst, bufsize)
+    shutil.copystat(src, dst)
+
+
+def _fast_copy(src, dst):
+    """
+    Copy one sample profile, cheapest mechanism first.
+    
+    Tries a CoW reflink, then in-kernel sendfile, then a buffered copy.
+    Hardlinks are deliberately not used: profile edits rewrite the file
+    in place and would silently modify the bundled sample too.
+    """
+    try:
+        _reflink_copy(src, dst)
+        return
+    except (ImportError, OSError):
+        pass
+    try:
+        _sendfile_copy(src, dst, os.stat(src).st_size)
+    except (AttributeError, OSError):
+        # No file-to-file sendfile on this platform
+        _buffered_copy(src, dst)
 
 
 def setup_user_directories(profiles_dir, runs_dir):
     """Setup user directories, copying sample profiles if needed."""
-    os.makedirs(profiles_dir, exist_ok=True)
-    os.makedirs(runs_dir, exist_ok=True)
+    _ensure_dir(profiles_dir)
+    _ensure_dir(runs_dir)
     
     # If profiles dir is empty and we have bundled samples, copy them
-    if not os.listdir(profiles_dir):
-        bundled_profiles = get_resource_path('profiles')
-        if os.path.exists(bundled_profiles):
-            for f in os.listdir(bundled_profiles):
-                if f.endswith(('.yaml', '.yml')):
-                    src = os.path.join(bundled_profiles, f)
-                    dst = os.path.join(profiles_dir, f)
-                    shutil.copy2(src, dst)
-                    print(f"  Copied sample profile: {f}")
+    if not _is_empty(profiles_dir):
+        return
+    try:
+        it = os.scandir(get_resource_path('profiles'))
+    except FileNotFoundError:
+        return
+    # entry.path already carries the source prefix; build the destination
+    # the same way instead of an os.path.join per file
+    dst_prefix = os.path.join(profiles_dir, '')
+    with it:
+        samples = [
+            (entry.path, dst_prefix + entry.name)
+            for entry in it
+            if entry.is_file() and entry.name.endswith(_YAML_SUFFIXES)
+        ]
+    if not samples:
+        return
+    
+    # Copies block in read/write syscalls with the GIL released, so a small
+    # pool overlaps them on slow flash storage
+    with ThreadPoolExecutor(max_workers=min(8, os.cpu_count() or 4, len(samples))) as ex:
+        list(ex.map(lambda pair: _fast_copy(*pair), samples))
+    for _, dst in samples:
+        print(f"  Copied sample profile: {os.path.basename(dst)}")
+
+
+# Length of a generated secret key; a shorter file is treated as damaged
+SECRET_KEY_BYTES = 32
+
+
+def _load_secret_key(instance_dir):
+    """
+    Load the Flask secret key from instance_dir, creating it on first start.
+    
+    Keeping it on disk means session cookies survive restarts and the
+    debug reloader instead of being invalidated by a fresh random key.
+    The instance dir is never served, unlike runs_dir.
+    """
+    _ensure_dir(instance_dir)
+    key_path = os.path.join(instance_dir, 'secret_key')
+    try:
+        with open(key_path, 'rb') as f:
+            key = f.read()
+        if len(key) >= SECRET_KEY_BYTES:
+            return key
+    except FileNotFoundError:
+        pass
+    
+    # Missing, empty or truncated: write a fresh key atomically (mkstemp
+    # creates the file 0600)
+    key = secrets.token_bytes(SECRET_KEY_BYTES)
+    fd, tmp_path = tempfile.mkstemp(dir=instance_dir, suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            f.write(key)
+        os.replace(tmp_path, key_path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+    return key
 
 
 def create_app(profiles_dir: str = None, runs_dir: str = None) -> tuple:
     """Create and configure the Flask application with SocketIO."""
+    # Imported here so `app.py --help` doesn't pay for Flask/paramiko imports
+    from flask import Flask
+    from flask_socketio import SocketIO
+    
+    from core import ProfileManager, StorageManager, ExperimentEngine, init_sync
+    from web.routes import web, init_routes
     
     # Determine directories
     base_dir = get_base_dir()
-    working_dir = get_working_dir()
     
     # Set default directories (in working directory for user data)
     if profiles_dir is None:
-        profiles_dir = os.path.join(working_dir, 'profiles')
+        profiles_dir = get_default_dir('profiles')
     if runs_dir is None:
-        runs_dir = os.path.join(working_dir, 'runs')
+        runs_dir = get_default_dir('runs')
     
     # Setup user directories
     setup_user_directories(profiles_dir, runs_dir)
@@ -88,12 +280,41 @@ def create_app(profiles_dir: str = None, runs_dir: str = None) -> tuple:
     engine = ExperimentEngine(storage_manager, profile_manager)
     
     # Create Flask app with bundled templates/static
+    # instance_path sits next to profiles/ and runs/ so it persists under
+    # PyInstaller too, and is outside everything the app serves
     app = Flask(__name__, 
                 template_folder=get_resource_path(os.path.join('web', 'templates')),
-                static_folder=get_resource_path(os.path.join('web', 'static')))
+                static_folder=get_resource_path(os.path.join('web', 'static')),
+                instance_path=os.path.abspath(get_default_dir('instance')))
+    
+    # Serve /static straight from the WSGI layer (sendfile, precomputed
+    # headers) instead of Flask's per-request send_from_directory
+    try:
+        from whitenoise import WhiteNoise
+        app.wsgi_app = WhiteNoise(app.wsgi_app, root=app.static_folder,
+                                  prefix='static/', max_age=STATIC_MAX_AGE)
+    except ImportError:
+        pass
+    
+    # Compress HTML and JSON responses (event lists repeat the same keys on
+    # every entry); streamed zip downloads are not in the list
+    try:
+        from flask_compress import Compress
+        app.config['COMPRESS_MIMETYPES'] = ['text/html', 'application/json']
+        app.config['COMPRESS_MIN_SIZE'] = COMPRESS_MIN_SIZE
+        Compress(app)
+    except ImportError:
+        pass
+    
+    # Encode jsonify() responses with orjson when it's installed
+    try:
+        from web.json_provider import OrjsonProvider
+        app.json = OrjsonProvider(app)
+    except ImportError:
+        pass
     
     # Configuration
-    app.config['SECRET_KEY'] = os.urandom(24)
+    app.config['SECRET_KEY'] = _load_secret_key(app.instance_path)
     app.config['PROFILES_DIR'] = profiles_dir
     app.config['RUNS_DIR'] = runs_dir
     
@@ -104,11 +325,22 @@ def create_app(profiles_dir: str = None, runs_dir: str = None) -> tuple:
     sync_manager = init_sync(socketio)
     
     # Initialize routes with managers
-    init_routes(engine, profile_manager, storage_manager, base_dir, sync_manager)
+    init_routes(app, engine, profile_manager, storage_manager, base_dir, sync_manager)
     
     # Register blueprint
     app.register_blueprint(web)
     
+    # Persist compiled templates across restarts (per-user temp dir).
+    # Template auto-reload already follows debug mode, so it's off otherwise.
+    from jinja2 import FileSystemBytecodeCache
+    app.jinja_env.bytecode_cache = FileSystemBytecodeCache()
+    
+    # Compile templates now rather than on the first operator's request
+    with os.scandir(app.template_folder) as it:
+        for entry in it:
+            if entry.name.endswith('.html'):
+                app.jinja_env.get_template(entry.name)
+    
     # Add managers to app context
     app.engine = engine
     app.profile_manager = profile_manager
@@ -118,6 +350,15 @@ def create_app(profiles_dir: str = None, runs_dir: str = None) -> tuple:
     return app, socketio
 
 
+def create_reloader_stub() -> tuple:
+    """Create a bare app/SocketIO pair for the debug reloader's parent process."""
+    from flask import Flask
+    from flask_socketio import SocketIO
+    
+    app = Flask(__name__)
+    return app, SocketIO(app, async_mode='gevent')
+
+
 def main():
     """Main entry point."""
     parser = argparse.ArgumentParser(
@@ -159,29 +400,37 @@ Examples:
     
     args = parser.parse_args()
     
-    # Create app
-    app, socketio = create_app(
-        profiles_dir=args.profiles_dir,
-        runs_dir=args.runs_dir
-    )
+    # Resolve user-supplied directories once so every later join/open works
+    # on a short absolute path (no ~, .. or symlink hops)
+    if args.profiles_dir:
+        args.profiles_dir = os.path.realpath(os.path.expanduser(args.profiles_dir))
+    if args.runs_dir:
+        args.runs_dir = os.path.realpath(os.path.expanduser(args.runs_dir))
     
-    # Print startup info
-    print(f"""
-╔═══════════════════════════════════════════════════════════════╗
-║                                                               ║
-║   ECR - Experiment Control & Record                          ║
-║   Multi-User Collaborative Mode (WebSocket)                   ║
-║                                                               ║
-║   Web Interface: http://{args.host}:{args.port:<5}                        ║
-║                                                               ║
-║   Profiles: {app.config['PROFILES_DIR']:<43} ║
-║   Runs:     {app.config['RUNS_DIR']:<43} ║
-║                                                               ║
-║   Share URL with team members to collaborate in real-time!    ║
-║   Press Ctrl+C to stop                                        ║
-║                                                               ║
-╚═══════════════════════════════════════════════════════════════╝
-""")
+    # With --debug the Werkzeug reloader parent only watches files and
+    # respawns the child (marked by WERKZEUG_RUN_MAIN), so give it a bare app
+    # and leave directory setup and manager init to the child.
+    if args.debug and os.environ.get('WERKZEUG_RUN_MAIN') != 'true':
+        app, socketio = create_reloader_stub()
+    else:
+        # Create app
+        app, socketio = create_app(
+            profiles_dir=args.profiles_dir,
+            runs_dir=args.runs_dir
+        )
+        
+        # Print startup info (the full banner only for an interactive terminal;
+        # under systemd/supervisor a single log line is enough)
+        if sys.stdout.isatty():
+            sys.stdout.write(BANNER.format(
+                host=args.host,
+                port=args.port,
+                profiles_dir=app.config['PROFILES_DIR'],
+                runs_dir=app.config['RUNS_DIR']
+            ))
+            sys.stdout.flush()
+        else:
+            print(f"ECR listening on {args.host}:{args.port}", flush=True)
     
     # Run the server with SocketIO (WebSocket support)
     try:
@@ -193,7 +442,10 @@ Examples:
         )
     except KeyboardInterrupt:
         print("\nShutting down...")
-        sys.exit(0)
+    finally:
+        # The reloader stub has no engine
+        if hasattr(app, 'engine'):
+            app.engine.shutdown()
 
 
 if __name__ == '__main__':
@@ -2,22 +2,43 @@
 ECR Core - Experiment Control & Record Engine
 """
 
-from .events import EventStream, EventType, Event
-from .ssh_client import SSHClientWrapper, ConnectionConfig, CommandResult
-from .profiles import (
-    TargetProfile, CommandDefinition, CollectorDefinition,
-    ProfileManager, substitute_parameters, get_command_parameters
-)
-from .storage import RunStorage, StorageManager, RunManifest, RunStatus
-from .engine import ExperimentEngine, RunContext
-from .sync import SyncManager, init_sync, get_sync_manager
+import importlib
+
+# Exported name -> submodule. Submodules are imported on first attribute
+# access (PEP 562) so e.g. ProfileManager doesn't pull in paramiko.
+_LAZY = {
+    'EventStream': 'events', 'EventType': 'events', 'Event': 'events',
+    'SSHClientWrapper': 'ssh_client', 'ConnectionConfig': 'ssh_client',
+    'CommandResult': 'ssh_client', 'SSHPool': 'ssh_pool',
+    'TargetProfile': 'profiles', 'CommandDefinition': 'profiles',
+    'CollectorDefinition': 'profiles', 'ProfileManager': 'profiles',
+    'substitute_parameters': 'profiles', 'get_command_parameters': 'profiles',
+    'RunStorage': 'storage', 'StorageManager': 'storage',
+    'RunManifest': 'storage', 'RunStatus': 'storage',
+    'ExperimentEngine': 'engine', 'RunContext': 'engine',
+    'SyncManager': 'sync', 'init_sync': 'sync', 'get_sync_manager': 'sync',
+}
 
 __all__ = [
     'EventStream', 'EventType', 'Event',
-    'SSHClientWrapper', 'ConnectionConfig', 'CommandResult',
+    'SSHClientWrapper', 'ConnectionConfig', 'CommandResult', 'SSHPool',
     'TargetProfile', 'CommandDefinition', 'CollectorDefinition',
     'ProfileManager', 'substitute_parameters', 'get_command_parameters',
     'RunStorage', 'StorageManager', 'RunManifest', 'RunStatus',
     'ExperimentEngine', 'RunContext',
     'SyncManager', 'init_sync', 'get_sync_manager'
 ]
+
+
+def __getattr__(name):
+    try:
+        module_name = _LAZY[name]
+    except KeyError:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}") from None
+    value = getattr(importlib.import_module(f'.{module_name}', __name__), name)
+    globals()[name] = value
+    return value
+
+
+def __dir__():
+    return sorted(set(globals()) | set(__all__))
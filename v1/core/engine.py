@@ -4,15 +4,24 @@ Orchestrates runs, commands, and background collectors.
 """
 
 import os
+import queue
+import re
+import shutil
 import subprocess
 import threading
 import time
+import weakref
+from collections import OrderedDict
+from concurrent.futures import wait as wait_futures
+from functools import lru_cache
 from datetime import datetime, timezone
-from typing import Any, Callable, Dict, List, Optional
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
 from dataclasses import dataclass, field
 
-from .events import EventStream, EventType
+from .events import EventStream, EventType, COLLECTOR_OUTPUT, COLLECTOR_ERROR
 from .ssh_client import SSHClientWrapper, ConnectionConfig, CommandResult
+from .ssh_pool import SSHPool
+from .scheduler import ScheduledTask, TaskScheduler
 from .profiles import (
     TargetProfile, CommandDefinition, CollectorDefinition,
     substitute_parameters, get_command_parameters
@@ -20,14 +29,42 @@ from .profiles import (
 from .storage import RunStorage, RunManifest, RunStatus
 
 
+# Number of loaded (not active) run contexts kept in memory
+CONTEXT_CACHE_SIZE = 32
+
+# Worker threads shared by all background collectors across all runs
+COLLECTOR_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+
+# Extra seconds past a collector's command timeout to wait for its last tick
+COLLECTOR_STOP_GRACE = 5
+
+# Artifact pulls queued per run before execute_command blocks
+ARTIFACT_QUEUE_SIZE = 4
+
+# Events are handed to UI callbacks in batches gathered over this window
+NOTIFY_BATCH_WINDOW = 0.005
+NOTIFY_BATCH_MAX = 256
+
+# High-churn event types where a batch only forwards the newest event
+# per (run, collector); everything is still recorded in events.jsonl
+COALESCED_EVENT_TYPES = frozenset({COLLECTOR_OUTPUT})
+
+# Manifest changes made within this window share one write to disk
+MANIFEST_SAVE_DELAY = 0.2
+
+
 @dataclass
 class BackgroundCollector:
     """Running background collector."""
     name: str
     definition: CollectorDefinition
-    thread: Optional[threading.Thread] = None
+    task: Optional[ScheduledTask] = None
     stop_event: Optional[threading.Event] = None
     running: bool = False
+    # Emits COLLECTOR_STOPPED; called once, by stop or by the last tick
+    on_stop: Optional[Callable[[], None]] = None
+    # Guards task rescheduling against a concurrent stop
+    lock: threading.Lock = field(default_factory=threading.Lock)
 
 
 @dataclass 
@@ -41,26 +78,77 @@ class RunContext:
     ssh: Optional[SSHClientWrapper] = None
     parameters: Dict[str, str] = field(default_factory=dict)
     collectors: Dict[str, BackgroundCollector] = field(default_factory=dict)
+    # Names of running collectors, rebuilt on start/stop for cheap reads
+    active_collectors: Tuple[str, ...] = ()
     is_running: bool = False
     is_paused: bool = False
+    # Pending (remote_path, command_name) pulls and the thread serving them
+    artifact_queue: Optional[queue.Queue] = None
+    artifact_puller: Optional[threading.Thread] = None
+    # Serializes lifecycle transitions (start/pause/complete/delete)
+    lock: threading.RLock = field(default_factory=threading.RLock)
+    # Deferred manifest write (see ExperimentEngine._save_manifest)
+    manifest_dirty: bool = False
+    manifest_save: Optional[ScheduledTask] = None
+    manifest_lock: threading.Lock = field(default_factory=threading.Lock)
+
+
+# Anything that needs a real shell to interpret: operators, redirection,
+# expansion, quoting, globbing, comments, assignments
+_SHELL_SYNTAX_RE = re.compile(r'[|&;<>()$`\\"\'*?\[\]{}~#=%!\n]')
+
+# /bin/sh builtins (POSIX plus common dash/bash ones). These always go
+# through the shell: some only make sense there, and the rest behave
+# differently from the same-named /bin utility (dash's echo prints -e
+# literally, /bin/echo treats it as an option)
+_SHELL_BUILTINS = frozenset({
+    '.', ':', '[', 'alias', 'bg', 'break', 'cd', 'command', 'continue',
+    'echo', 'eval', 'exec', 'exit', 'export', 'false', 'fc', 'fg',
+    'getopts', 'hash', 'jobs', 'kill', 'let', 'local', 'printf', 'pwd',
+    'read', 'readonly', 'return', 'set', 'shift', 'source', 'test', 'times',
+    'trap', 'true', 'type', 'ulimit', 'umask', 'unalias', 'unset', 'wait',
+})
+
+
+@lru_cache(maxsize=256)
+def _direct_argv(command: str) -> Optional[Tuple[str, ...]]:
+    """
+    Split command into argv when it can run without /bin/sh, else None.
+    Only plain "program arg arg" commands qualify. The program is not
+    resolved here, so PATH changes are picked up on every call.
+    """
+    if _SHELL_SYNTAX_RE.search(command):
+        return None
+    argv = command.split()
+    if not argv or argv[0] in _SHELL_BUILTINS:
+        return None
+    return tuple(argv)
 
 
 def execute_host_command(command: str, timeout: int = 60) -> CommandResult:
-    """Execute a command on the host (controller) machine."""
+    """
+    Execute a command on the host (controller) machine.
+    Simple commands are exec'd directly; anything using shell syntax
+    goes through /bin/sh as before.
+    """
     start_time = time.time()
+    argv = _direct_argv(command)
+    # Unknown programs still go through /bin/sh for its usual exit code 127
+    program = shutil.which(argv[0]) if argv else None
     try:
         result = subprocess.run(
-            command,
-            shell=True,
-            capture_output=True,
-            text=True,
+            argv if program else command,
+            executable=program,
+            shell=program is None,
+            stdout=subprocess.PIPE,
+            stderr=subprocess.PIPE,
             timeout=timeout
         )
         return CommandResult(
             command=command,
             exit_code=result.returncode,
-            stdout=result.stdout,
-            stderr=result.stderr,
+            stdout=result.stdout.decode('utf-8', errors='replace'),
+            stderr=result.stderr.decode('utf-8', errors='replace'),
             start_time=start_time,
             end_time=time.time()
         )
@@ -96,15 +184,54 @@ class ExperimentEngine:
         self._active_runs: Dict[str, RunContext] = {}
         self._lock = threading.RLock()
         
+        # LRU of contexts loaded from storage, so polling and notes on
+        # inactive runs don't reparse the manifest/profile every call
+        self._ctx_cache: "OrderedDict[str, RunContext]" = OrderedDict()
+        
+        # One EventStream per events file, alive while any context holds it.
+        # An evicted context may still be in use; reloading the run must get
+        # the same stream, or two seq counters would hand out duplicates
+        self._streams: "weakref.WeakValueDictionary[str, EventStream]" = \
+            weakref.WeakValueDictionary()
+        self._streams_lock = threading.Lock()
+        
+        # Shared SSH connections, handed to runs on start and returned on
+        # pause/complete so consecutive runs skip the handshake
+        self._ssh_pool = SSHPool()
+        
+        # Collector ticks and deferred manifest saves run on a bounded pool
+        # instead of a thread each
+        self._scheduler = TaskScheduler(
+            COLLECTOR_WORKERS, thread_name_prefix='ecr-collector'
+        )
+        
         # Event callbacks for UI updates (receives run_id, event_dict)
         self._event_callbacks: List[Callable[[str, Dict], None]] = []
+        
+        # Batch callbacks get each dispatch window's events for a run in
+        # one call (receives run_id, [event_dict, ...])
+        self._batch_callbacks: List[Callable[[str, List[Dict]], None]] = []
+        
+        # Callbacks run on a dispatcher thread so a slow UI push never
+        # stalls collectors or command execution
+        self._notify_queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._dispatcher: Optional[threading.Thread] = None
+        self._dispatcher_lock = threading.Lock()
+        
+        # Newest notified seq per run, for long-polling clients
+        self._latest_seq: Dict[str, int] = {}
+        self._seq_cond = threading.Condition()
     
     def add_event_callback(self, callback: Callable[[str, Dict], None]):
         """Add callback for real-time event notifications."""
         self._event_callbacks.append(callback)
     
+    def add_event_batch_callback(self, callback: Callable[[str, List[Dict]], None]):
+        """Add callback receiving a run's events one dispatch batch at a time."""
+        self._batch_callbacks.append(callback)
+    
     def _notify_event(self, run_id: str, event):
-        """Notify all callbacks of a new event."""
+        """Queue an event for delivery to all callbacks."""
         event_dict = {
             'seq': event.seq,
             'timestamp': event.timestamp,
@@ -113,12 +240,68 @@ class ExperimentEngine:
         }
         if event.user:
             event_dict['user'] = event.user
+        
+        with self._seq_cond:
+            if event.seq > self._latest_seq.get(run_id, 0):
+                self._latest_seq[run_id] = event.seq
+                self._seq_cond.notify_all()
+        
+        if self._dispatcher is None:
+            with self._dispatcher_lock:
+                if self._dispatcher is None:
+                    self._dispatcher = threading.Thread(
+                        target=self._dispatch_loop, daemon=True
+                    )
+                    self._dispatcher.start()
+        self._notify_queue.put((run_id, event_dict))
+    
+    def _dispatch_loop(self):
+        """Deliver queued events to callbacks, a batch at a time."""
+        while True:
+            batch = [self._notify_queue.get()]
+            deadline = time.monotonic() + NOTIFY_BATCH_WINDOW
+            while len(batch) < NOTIFY_BATCH_MAX:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(self._notify_queue.get(timeout=remaining))
+                except queue.Empty:
+                    break
             
-        for callback in self._event_callbacks:
-            try:
-                callback(run_id, event_dict)
-            except Exception as e:
-                print(f"Event callback error: {e}")
+            by_run: Dict[str, List[Dict]] = {}
+            for run_id, event_dict in self._coalesce(batch):
+                by_run.setdefault(run_id, []).append(event_dict)
+                for callback in self._event_callbacks:
+                    try:
+                        callback(run_id, event_dict)
+                    except Exception as e:
+                        print(f"Event callback error: {e}")
+            
+            for run_id, events in by_run.items():
+                for callback in self._batch_callbacks:
+                    try:
+                        callback(run_id, events)
+                    except Exception as e:
+                        print(f"Event callback error: {e}")
+    
+    @staticmethod
+    def _coalesce(batch: List[tuple]) -> List[tuple]:
+        """Drop all but the newest high-churn event per (run, collector)."""
+        latest = {}
+        churn = 0
+        for i, (run_id, event_dict) in enumerate(batch):
+            if event_dict['type'] in COALESCED_EVENT_TYPES:
+                key = (run_id, event_dict['type'], event_dict['data'].get('collector'))
+                latest[key] = i
+                churn += 1
+        if churn == len(latest):
+            return batch
+        keep = set(latest.values())
+        return [
+            item for i, item in enumerate(batch)
+            if item[1]['type'] not in COALESCED_EVENT_TYPES or i in keep
+        ]
     
     def _notify(self, event_type: str, data: Any):
         """Legacy notify - kept for compatibility."""
@@ -142,7 +325,7 @@ class ExperimentEngine:
         
         # Default to all commands if none selected
         if selected_commands is None:
-            selected_commands = list(profile.commands.keys())
+            selected_commands = list(profile.command_names)
         
         # Generate run ID
         run_id = self.storage_manager.generate_run_id(name)
@@ -165,7 +348,7 @@ class ExperimentEngine:
         )
         
         # Create event stream (no event logged yet - starts with RUN_STARTED)
-        EventStream(storage.events_path)
+        self._event_stream(storage.events_path)
         
         return run_id
     
@@ -174,6 +357,10 @@ class ExperimentEngine:
         with self._lock:
             if run_id in self._active_runs:
                 return self._active_runs[run_id]
+            ctx = self._ctx_cache.get(run_id)
+            if ctx is not None:
+                self._ctx_cache.move_to_end(run_id)
+                return ctx
         
         # Load from storage
         storage = self.storage_manager.get_run(run_id)
@@ -188,9 +375,9 @@ class ExperimentEngine:
         if not profile:
             return None
         
-        events = EventStream(storage.events_path)
+        events = self._event_stream(storage.events_path)
         
-        return RunContext(
+        ctx = RunContext(
             run_id=run_id,
             storage=storage,
             manifest=manifest,
@@ -198,6 +385,72 @@ class ExperimentEngine:
             events=events,
             parameters=manifest.parameters.copy()
         )
+        
+        evicted = []
+        with self._lock:
+            # Another thread may have loaded the same run meanwhile
+            existing = self._active_runs.get(run_id) or self._ctx_cache.get(run_id)
+            if existing is not None:
+                return existing
+            self._ctx_cache[run_id] = ctx
+            while len(self._ctx_cache) > CONTEXT_CACHE_SIZE:
+                evicted_id, old = self._ctx_cache.popitem(last=False)
+                if evicted_id not in self._active_runs:
+                    evicted.append(old)
+        
+        # Flushed outside the engine lock so other lookups don't wait on disk
+        for old in evicted:
+            self._save_manifest(old, immediate=True)
+            # Only releases the file handles; a caller still holding
+            # the context can keep appending (the stream reopens),
+            # and a reload shares the same stream via _event_stream
+            old.events.close()
+        
+        return ctx
+    
+    def _event_stream(self, path: str) -> EventStream:
+        """The shared EventStream for an events file, opening it if needed."""
+        with self._streams_lock:
+            stream = self._streams.get(path)
+            if stream is None:
+                stream = EventStream(path)
+                self._streams[path] = stream
+            return stream
+    
+    def _save_manifest(self, ctx: RunContext, immediate: bool = False):
+        """
+        Persist ctx.manifest. Routine changes are coalesced into one write
+        MANIFEST_SAVE_DELAY later; lifecycle transitions pass immediate=True.
+        """
+        with ctx.manifest_lock:
+            ctx.manifest_dirty = True
+            if not immediate:
+                if ctx.manifest_save is None:
+                    ctx.manifest_save = self._scheduler.schedule(
+                        MANIFEST_SAVE_DELAY, lambda: self._flush_manifest(ctx)
+                    )
+                return
+        self._flush_manifest(ctx)
+    
+    def _flush_manifest(self, ctx: RunContext):
+        """Write the manifest now if it has unsaved changes."""
+        with ctx.manifest_lock:
+            self._scheduler.cancel(ctx.manifest_save)
+            ctx.manifest_save = None
+            if not ctx.manifest_dirty:
+                return
+            ctx.manifest_dirty = False
+            try:
+                ctx.storage.save_manifest(ctx.manifest)
+            except OSError as e:
+                print(f"Failed to save manifest for {ctx.run_id}: {e}")
+    
+    def _discard_manifest_changes(self, ctx: RunContext):
+        """Drop a pending manifest write (the run is being deleted)."""
+        with ctx.manifest_lock:
+            self._scheduler.cancel(ctx.manifest_save)
+            ctx.manifest_save = None
+            ctx.manifest_dirty = False
     
     def start_run(self, run_id: str) -> bool:
         """Start or resume a run."""
@@ -205,7 +458,9 @@ class ExperimentEngine:
         if not ctx:
             return False
         
-        with self._lock:
+        # Only this run is locked while connecting callbacks, writing the
+        # manifest and logging; the engine lock just guards _active_runs
+        with ctx.lock:
             if ctx.is_running:
                 return True
             
@@ -228,7 +483,7 @@ class ExperimentEngine:
                 self._notify_event(run_id, event)
             
             conn = ctx.profile.connection
-            ctx.ssh = SSHClientWrapper(
+            ctx.ssh = self._ssh_pool.acquire(
                 ConnectionConfig(
                     host=conn.host,
                     port=conn.port,
@@ -241,13 +496,16 @@ class ExperimentEngine:
                 on_disconnect=on_disconnect,
                 on_retry=on_retry
             )
+            # A pooled client that is still connected never calls on_connect
+            if ctx.ssh.is_connected:
+                on_connect()
             
             # Update status
             was_paused = ctx.manifest.status == RunStatus.PAUSED.value
             ctx.manifest.status = RunStatus.RUNNING.value
             if not ctx.manifest.started_at:
                 ctx.manifest.started_at = datetime.now(timezone.utc).isoformat()
-            ctx.storage.save_manifest(ctx.manifest)
+            self._save_manifest(ctx, immediate=True)
             
             if was_paused:
                 event = ctx.events.append(EventType.RUN_RESUMED, {})
@@ -257,56 +515,68 @@ class ExperimentEngine:
             
             ctx.is_running = True
             ctx.is_paused = False
-            self._active_runs[run_id] = ctx
+            with self._lock:
+                self._active_runs[run_id] = ctx
             
             return True
     
     def pause_run(self, run_id: str) -> bool:
         """Pause an active run."""
-        with self._lock:
-            ctx = self._active_runs.get(run_id)
-            if not ctx or not ctx.is_running:
+        ctx = self._active_runs.get(run_id)
+        if not ctx:
+            return False
+        
+        with ctx.lock:
+            if not ctx.is_running:
                 return False
             
             # Stop all background collectors
-            for coll_name in list(ctx.collectors.keys()):
-                self.stop_collector(run_id, coll_name)
+            self._stop_collectors(ctx)
+            
+            # Finish queued pulls while the connection is still ours
+            self._drain_artifacts(ctx)
+            
+            # Hand the connection back; start_run acquires one on resume
+            if ctx.ssh:
+                self._ssh_pool.release(ctx.ssh)
+                ctx.ssh = None
             
             ctx.is_running = False
             ctx.is_paused = True
             ctx.manifest.status = RunStatus.PAUSED.value
-            ctx.storage.save_manifest(ctx.manifest)
-            event = ctx.events.append(EventType.RUN_PAUSED, {})
+            self._save_manifest(ctx, immediate=True)
+            event = ctx.events.append(EventType.RUN_PAUSED, {}, force_flush=True)
             self._notify_event(run_id, event)
             
             return True
     
     def complete_run(self, run_id: str) -> bool:
         """Mark a run as completed."""
-        with self._lock:
-            ctx = self._active_runs.get(run_id)
-            if not ctx:
-                ctx = self.get_run_context(run_id)
-                if not ctx:
-                    return False
-            
+        ctx = self._active_runs.get(run_id) or self.get_run_context(run_id)
+        if not ctx:
+            return False
+        
+        with ctx.lock:
             # Stop all background collectors
-            for coll_name in list(ctx.collectors.keys()):
-                self.stop_collector(run_id, coll_name)
+            self._stop_collectors(ctx)
             
-            # Disconnect SSH
-            if ctx.ssh:
-                ctx.ssh.disconnect()
+            # Finish queued pulls while the connection is still ours
+            self._drain_artifacts(ctx)
+            
+            # Return SSH connection to the pool
+            if ctx.ssh and ctx.is_running:
+                self._ssh_pool.release(ctx.ssh)
+            ctx.ssh = None
             
             ctx.is_running = False
             ctx.manifest.status = RunStatus.COMPLETED.value
             ctx.manifest.completed_at = datetime.now(timezone.utc).isoformat()
-            ctx.storage.save_manifest(ctx.manifest)
-            event = ctx.events.append(EventType.RUN_COMPLETED, {})
+            self._save_manifest(ctx, immediate=True)
+            event = ctx.events.append(EventType.RUN_COMPLETED, {}, force_flush=True)
             self._notify_event(run_id, event)
             
-            if run_id in self._active_runs:
-                del self._active_runs[run_id]
+            with self._lock:
+                self._active_runs.pop(run_id, None)
             
             return True
     
@@ -324,7 +594,7 @@ class ExperimentEngine:
         
         ctx.parameters[name] = value
         ctx.manifest.parameters[name] = value
-        ctx.storage.save_manifest(ctx.manifest)
+        self._save_manifest(ctx)
         event = ctx.events.append(EventType.PARAMETER_SET, {'name': name, 'value': value}, user=user)
         self._notify_event(run_id, event)
         return True
@@ -346,9 +616,16 @@ class ExperimentEngine:
             user: Optional user info {username, color} who triggered the command
         """
         ctx = self._active_runs.get(run_id)
-        if not ctx or not ctx.is_running:
+        if not ctx:
             return {'success': False, 'error': 'Run not active'}
         
+        # Checked with the connection under the lock: once pause_run has
+        # released the client it may already belong to another run
+        with ctx.lock:
+            if not ctx.is_running:
+                return {'success': False, 'error': 'Run not active'}
+            ssh = ctx.ssh
+        
         cmd_def = ctx.profile.commands.get(command_name)
         if not cmd_def:
             return {'success': False, 'error': f'Command not found: {command_name}'}
@@ -368,8 +645,8 @@ class ExperimentEngine:
         # Execute on host or target
         if cmd_def.run == 'target':
             # Ensure SSH connection
-            if not ctx.ssh.is_connected:
-                if not ctx.ssh.connect():
+            if not ssh.is_connected:
+                if not ssh.connect():
                     event = ctx.events.append(EventType.COMMAND_FAILED, {
                         'command_name': command_name,
                         'error': 'SSH connection failed'
@@ -377,7 +654,7 @@ class ExperimentEngine:
                     self._notify_event(run_id, event)
                     return {'success': False, 'error': 'SSH connection failed'}
             
-            result = ctx.ssh.execute(cmd, timeout=cmd_def.timeout)
+            result = ssh.execute_pipelined(cmd, timeout=cmd_def.timeout)
         else:
             # Execute on host
             result = execute_host_command(cmd, timeout=cmd_def.timeout)
@@ -401,41 +678,18 @@ class ExperimentEngine:
         
         self._notify_event(run_id, event)
         
-        # Pull artifacts (only for target commands with artifacts)
-        artifacts = []
+        # Queue artifact pulls (only for target commands with artifacts);
+        # results are reported through ARTIFACT_* events
+        pending_artifacts = []
         if cmd_def.run == 'target' and cmd_def.artifacts:
             for artifact_template in cmd_def.artifacts:
                 remote_path = substitute_parameters(artifact_template, ctx.parameters)
-                
-                event = ctx.events.append(EventType.ARTIFACT_PULL_STARTED, {'remote_path': remote_path})
-                self._notify_event(run_id, event)
-                
-                # Create temp local path
-                temp_path = os.path.join(ctx.storage.artifacts_dir, 
-                                         f"_temp_{os.path.basename(remote_path)}")
-                
-                pull_success, error = ctx.ssh.get_file(remote_path, temp_path)
-                
-                if pull_success:
-                    # Move to proper location in storage
-                    local_path = ctx.storage.add_artifact(temp_path, remote_path)
-                    os.remove(temp_path)
-                    
-                    artifact_info = {
-                        'remote_path': remote_path,
-                        'local_path': local_path,
-                        'command': command_name
-                    }
-                    ctx.manifest.artifacts.append(artifact_info)
-                    ctx.storage.save_manifest(ctx.manifest)
-                    
-                    event = ctx.events.append(EventType.ARTIFACT_PULLED, artifact_info)
-                    self._notify_event(run_id, event)
-                    artifacts.append(artifact_info)
+                if self._queue_artifact(ctx, remote_path, command_name):
+                    pending_artifacts.append(remote_path)
                 else:
                     event = ctx.events.append(EventType.ARTIFACT_PULL_FAILED, {
                         'remote_path': remote_path,
-                        'error': error
+                        'error': 'Run not active'
                     })
                     self._notify_event(run_id, event)
         
@@ -447,76 +701,198 @@ class ExperimentEngine:
             'stdout': result.stdout,
             'stderr': result.stderr,
             'duration': result.duration,
-            'artifacts': artifacts
+            'artifacts': [],
+            'pending_artifacts': pending_artifacts
         }
     
-    def start_collector(self, run_id: str, collector_name: str) -> bool:
-        """Start a background collector."""
-        ctx = self._active_runs.get(run_id)
-        if not ctx or not ctx.is_running:
-            return False
-        
-        if collector_name in ctx.collectors and ctx.collectors[collector_name].running:
+    def execute_commands(
+        self,
+        run_id: str,
+        command_names: List[str],
+        user: Optional[Dict[str, str]] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Execute several commands in order, as one request.
+        Commands run sequentially since later ones may depend on earlier
+        ones; one result dict per name, in the same order.
+        """
+        return [self.execute_command(run_id, name, user=user) for name in command_names]
+    
+    def _queue_artifact(self, ctx: RunContext, remote_path: str, command_name: str) -> bool:
+        """
+        Hand an artifact to the run's puller thread.
+        Blocks while ARTIFACT_QUEUE_SIZE pulls are already waiting.
+        Returns False if the run stopped, since pause/complete has already
+        drained the puller and given the connection back.
+        """
+        # Same lock as _drain_artifacts' callers, so a pull is either queued
+        # ahead of the sentinel or refused
+        with ctx.lock:
+            if not ctx.is_running:
+                return False
+            if ctx.artifact_puller is None or not ctx.artifact_puller.is_alive():
+                ctx.artifact_queue = queue.Queue(maxsize=ARTIFACT_QUEUE_SIZE)
+                ctx.artifact_puller = threading.Thread(
+                    target=self._artifact_loop, args=(ctx, ctx.artifact_queue), daemon=True
+                )
+                ctx.artifact_puller.start()
+            ctx.artifact_queue.put((remote_path, command_name))
             return True
+    
+    def _artifact_loop(self, ctx: RunContext, pending: queue.Queue):
+        """Pull queued artifacts until a None sentinel arrives."""
+        while True:
+            item = pending.get()
+            if item is None:
+                return
+            try:
+                self._pull_artifact(ctx, *item)
+            except Exception as e:
+                print(f"Artifact pull failed for {item[0]}: {e}")
+    
+    def _drain_artifacts(self, ctx: RunContext):
+        """Wait for queued artifact pulls to finish and stop the puller."""
+        puller = ctx.artifact_puller
+        if puller is None:
+            return
+        if puller.is_alive():
+            ctx.artifact_queue.put(None)
+            puller.join()
+        ctx.artifact_puller = None
+        ctx.artifact_queue = None
+    
+    def _pull_artifact(self, ctx: RunContext, remote_path: str, command_name: str):
+        """Copy one artifact from the target into run storage."""
+        run_id = ctx.run_id
+        event = ctx.events.append(EventType.ARTIFACT_PULL_STARTED, {'remote_path': remote_path})
+        self._notify_event(run_id, event)
         
-        coll_def = ctx.profile.background_collectors.get(collector_name)
-        if not coll_def:
-            return False
+        # Pull straight into the final artifact file
+        local_file = ctx.storage.reserve_artifact_path(remote_path)
         
-        # For target collectors, ensure SSH is connected
-        if coll_def.run == 'target':
-            if not ctx.ssh.is_connected:
-                if not ctx.ssh.connect():
-                    return False
-        
-        stop_event = threading.Event()
-        collector = BackgroundCollector(
-            name=collector_name,
-            definition=coll_def,
-            stop_event=stop_event
-        )
+        pull_success, error = ctx.ssh.get_file(remote_path, local_file)
         
-        def collector_loop():
-            event = ctx.events.append(EventType.COLLECTOR_STARTED, {
-                'collector': collector_name,
-                'run_location': coll_def.run
+        if pull_success:
+            local_path = ctx.storage.register_artifact(local_file)
+            
+            artifact_info = {
+                'remote_path': remote_path,
+                'local_path': local_path,
+                'command': command_name
+            }
+            ctx.manifest.artifacts.append(artifact_info)
+            self._save_manifest(ctx)
+            
+            event = ctx.events.append(EventType.ARTIFACT_PULLED, artifact_info)
+            self._notify_event(run_id, event)
+        else:
+            try:
+                os.remove(local_file)
+            except OSError:
+                pass
+            event = ctx.events.append(EventType.ARTIFACT_PULL_FAILED, {
+                'remote_path': remote_path,
+                'error': error
             })
             self._notify_event(run_id, event)
+    
+    def start_collectors(self, run_id: str, collector_names: List[str]) -> Dict[str, bool]:
+        """Start several background collectors; returns name -> success."""
+        return {name: self.start_collector(run_id, name) for name in collector_names}
+    
+    def start_collector(self, run_id: str, collector_name: str) -> bool:
+        """Start a background collector."""
+        ctx = self._active_runs.get(run_id)
+        if not ctx:
+            return False
+        
+        # Held throughout, so a concurrent start of the same collector or a
+        # pause_run cannot interleave with the connect and the registration
+        with ctx.lock:
+            if not ctx.is_running:
+                return False
+            ssh = ctx.ssh
+            
+            if collector_name in ctx.collectors and ctx.collectors[collector_name].running:
+                return True
+            
+            coll_def = ctx.profile.background_collectors.get(collector_name)
+            if not coll_def:
+                return False
+            
+            # For target collectors, ensure SSH is connected
+            if coll_def.run == 'target':
+                if not ssh.is_connected:
+                    if not ssh.connect():
+                        return False
             
-            while not stop_event.is_set():
+            stop_event = threading.Event()
+            collector = BackgroundCollector(
+                name=collector_name,
+                definition=coll_def,
+                stop_event=stop_event
+            )
+            
+            def emit_stopped():
+                event = ctx.events.append(EventType.COLLECTOR_STOPPED, {'collector': collector_name})
+                self._notify_event(run_id, event)
+            
+            def collect_once():
                 cmd = substitute_parameters(coll_def.command, ctx.parameters)
                 
                 if coll_def.run == 'target':
-                    result = ctx.ssh.execute(cmd, timeout=coll_def.timeout)
+                    result = ssh.execute_pipelined(cmd, timeout=coll_def.timeout)
                 else:
                     result = execute_host_command(cmd, timeout=coll_def.timeout)
                 
                 if result.success:
-                    event = ctx.events.append(EventType.COLLECTOR_OUTPUT, {
+                    event = ctx.events.append(COLLECTOR_OUTPUT, {
                         'collector': collector_name,
                         'stdout': result.stdout,
                         'stderr': result.stderr
                     })
                 else:
-                    event = ctx.events.append(EventType.COLLECTOR_ERROR, {
+                    event = ctx.events.append(COLLECTOR_ERROR, {
                         'collector': collector_name,
                         'error': result.stderr or 'Command failed'
                     })
                 
-                self._notify_event(run_id, event)
+                # None: output shed because the event writer is backed up
+                if event is not None:
+                    self._notify_event(run_id, event)
+            
+            def tick():
+                if not stop_event.is_set():
+                    try:
+                        collect_once()
+                    except Exception as e:
+                        print(f"Collector {collector_name} failed: {e}")
                 
-                stop_event.wait(coll_def.interval)
+                # Reschedule only after this tick finished, so a slow command
+                # never overlaps itself
+                with collector.lock:
+                    if not stop_event.is_set():
+                        collector.task = self._scheduler.schedule(
+                            coll_def.interval, tick
+                        )
+                        return
+                emit_stopped()
+            
+            collector.on_stop = emit_stopped
+            collector.running = True
+            ctx.collectors[collector_name] = collector
+            self._refresh_active_collectors(ctx)
             
-            event = ctx.events.append(EventType.COLLECTOR_STOPPED, {'collector': collector_name})
+            event = ctx.events.append(EventType.COLLECTOR_STARTED, {
+                'collector': collector_name,
+                'run_location': coll_def.run
+            })
             self._notify_event(run_id, event)
-        
-        thread = threading.Thread(target=collector_loop, daemon=True)
-        collector.thread = thread
-        collector.running = True
-        ctx.collectors[collector_name] = collector
-        thread.start()
-        
-        return True
+            
+            with collector.lock:
+                collector.task = self._scheduler.schedule(0, tick)
+            
+            return True
     
     def stop_collector(self, run_id: str, collector_name: str) -> bool:
         """Stop a background collector."""
@@ -524,14 +900,63 @@ class ExperimentEngine:
         if not ctx:
             return False
         
-        collector = ctx.collectors.get(collector_name)
-        if not collector or not collector.running:
-            return False
-        
-        collector.stop_event.set()
-        collector.running = False
+        with ctx.lock:
+            collector = ctx.collectors.get(collector_name)
+            if not collector or not collector.running:
+                return False
+            
+            self._signal_stop(collector)
+            self._refresh_active_collectors(ctx)
+            return True
+    
+    def get_active_collector_names(self, run_id: str) -> Tuple[str, ...]:
+        """Names of the run's running collectors (empty if not active)."""
+        ctx = self._active_runs.get(run_id)
+        return ctx.active_collectors if ctx else ()
+    
+    @staticmethod
+    def _refresh_active_collectors(ctx: RunContext):
+        # Recomputed under the lock from the flags themselves, so the last
+        # writer always publishes the current state
+        with ctx.lock:
+            ctx.active_collectors = tuple(
+                name for name, c in ctx.collectors.items() if c.running
+            )
+    
+    def _signal_stop(self, collector: BackgroundCollector):
+        """
+        Stop a collector without waiting for it.
+        Returns the future of a tick that is still running, if any.
+        """
+        with collector.lock:
+            collector.stop_event.set()
+            collector.running = False
+            # A waiting tick is dropped here; one already running sees
+            # stop_event when it finishes and reports the stop itself
+            cancelled = self._scheduler.cancel(collector.task)
+            in_flight = None if cancelled or collector.task is None else collector.task.future
         
-        return True
+        if cancelled:
+            collector.on_stop()
+        return in_flight
+    
+    def _stop_collectors(self, ctx: RunContext):
+        """
+        Stop every collector of a run, then wait for in-flight ticks together
+        so the run's SSH connection is idle before it is handed back.
+        """
+        in_flight = []
+        timeout = 0
+        for collector in list(ctx.collectors.values()):
+            if not collector.running:
+                continue
+            future = self._signal_stop(collector)
+            if future is not None:
+                in_flight.append(future)
+                timeout = max(timeout, collector.definition.timeout)
+        self._refresh_active_collectors(ctx)
+        if in_flight:
+            wait_futures(in_flight, timeout=timeout + COLLECTOR_STOP_GRACE)
     
     def add_note(
         self, 
@@ -548,14 +973,32 @@ class ExperimentEngine:
         self._notify_event(run_id, event)
         return True
     
-    def get_events(self, run_id: str, after_seq: int = 0) -> List[Dict[str, Any]]:
-        """Get events for a run, optionally after a sequence number."""
+    def get_events(
+        self,
+        run_id: str,
+        after_seq: int = 0,
+        limit: Optional[int] = None,
+        before_seq: Optional[int] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Get events for a run, optionally after a sequence number.
+        With limit, only the newest `limit` events (before before_seq, if
+        given) are read.
+        """
         ctx = self.get_run_context(run_id)
         if not ctx:
             return []
         
+        if limit is None:
+            source = ctx.events.iter_events(after_seq)
+        else:
+            source = (
+                e for e in ctx.events.iter_last_events(limit, before_seq)
+                if e.seq > after_seq
+            )
+        
         events = []
-        for e in ctx.events.iter_events(after_seq):
+        for e in source:
             event_dict = {
                 'seq': e.seq,
                 'timestamp': e.timestamp,
@@ -568,23 +1011,69 @@ class ExperimentEngine:
         
         return events
     
-    def export_run(self, run_id: str) -> Optional[str]:
-        """Create a zip archive of a run. Returns archive path."""
+    def save_report(self, run_id: str, html: str) -> bool:
+        """Write an exported HTML report into the run directory in the background."""
+        ctx = self.get_run_context(run_id)
+        if not ctx:
+            return False
+        
+        report_path = os.path.join(ctx.storage.run_dir, f'report_{run_id}.html')
+        
+        def write():
+            try:
+                with open(report_path, 'w', encoding='utf-8') as f:
+                    f.write(html)
+            except OSError as e:
+                print(f"Report save error: {e}")
+        
+        self._scheduler.schedule(0, write)
+        return True
+    
+    def latest_event_seq(self, run_id: str) -> int:
+        """Seq of the newest event notified for a run this process (0 if none)."""
+        return self._latest_seq.get(run_id, 0)
+    
+    def wait_for_events(self, run_id: str, after_seq: int, timeout: float) -> List[Dict[str, Any]]:
+        """
+        Block until a run has events after after_seq or timeout expires,
+        then return them (possibly empty).
+        """
+        with self._seq_cond:
+            self._seq_cond.wait_for(
+                lambda: self._latest_seq.get(run_id, 0) > after_seq, timeout
+            )
+        return self.get_events(run_id, after_seq)
+    
+    def shutdown(self):
+        """Close pooled SSH connections. Called once when the server exits."""
+        self._ssh_pool.close_all()
+    
+    def iter_export_run(self, run_id: str) -> Optional[Iterator[bytes]]:
+        """Stream a zip archive of a run as it is built. None if no such run."""
         storage = self.storage_manager.get_run(run_id)
         if not storage:
             return None
-        return storage.create_archive()
+        return storage.iter_archive()
     
     def delete_run(self, run_id: str) -> bool:
         """Delete a run."""
         with self._lock:
-            if run_id in self._active_runs:
-                # Stop everything first
-                ctx = self._active_runs[run_id]
-                for coll_name in list(ctx.collectors.keys()):
-                    self.stop_collector(run_id, coll_name)
-                if ctx.ssh:
-                    ctx.ssh.disconnect()
-                del self._active_runs[run_id]
+            cached = self._ctx_cache.pop(run_id, None)
+            active = self._active_runs.pop(run_id, None)
+            self._latest_seq.pop(run_id, None)
+        
+        if cached is not None and cached is not active:
+            self._discard_manifest_changes(cached)
+            cached.events.close()
+        if active is not None:
+            # Stop everything first
+            with active.lock:
+                self._stop_collectors(active)
+                self._drain_artifacts(active)
+                if active.ssh and active.is_running:
+                    self._ssh_pool.release(active.ssh)
+                active.is_running = False
+                self._discard_manifest_changes(active)
+                active.events.close()
         
         return self.storage_manager.delete_run(run_id)
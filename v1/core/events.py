@@ -5,14 +5,68 @@ Handles append-only JSONL event logging with immutability guarantees.
 
 from __future__ import annotations
 
+import atexit
+import heapq
+import itertools
 import json
 import os
+import queue
 import threading
-from datetime import datetime, timezone
-from typing import Any, Dict, Iterator, Optional
-from dataclasses import dataclass, asdict
+import time
+from array import array
+from typing import Any, Dict, Iterator, Optional, Union
 from enum import Enum
 
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
+
+if orjson is not None:
+    def _dumps(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_NON_STR_KEYS)
+    _loads = orjson.loads
+else:
+    def _dumps(obj) -> bytes:
+        return json.dumps(obj, ensure_ascii=False, separators=(',', ':')).encode('utf-8')
+    _loads = json.loads
+
+
+# How often written events are fsync'd as one group commit
+FLUSH_INTERVAL = 0.05
+
+# How long interpreter exit waits for queued events to reach the disk
+EXIT_FLUSH_TIMEOUT = 5.0
+
+# Read size when scanning the event file backwards from EOF
+REVERSE_CHUNK_SIZE = 1 << 16
+
+# Unwritten events a stream may have queued before collector output is
+# dropped; output resumes once the backlog is back under half of this
+EVENT_BACKLOG_LIMIT = 1024
+
+# Sidecar file holding the byte offset of every event line (array('Q'))
+INDEX_SUFFIX = '.idx'
+
+# (whole second, formatted 'YYYY-MM-DDTHH:MM:SS') for the last timestamp
+_ts_cache = (0, '')
+
+
+def _utc_timestamp() -> str:
+    """
+    Current UTC time in isoformat() layout, always with microseconds.
+    The date/time part is formatted once per second and reused.
+    """
+    global _ts_cache
+    now = time.time()
+    sec = int(now)
+    cached_sec, prefix = _ts_cache
+    if sec != cached_sec:
+        prefix = time.strftime('%Y-%m-%dT%H:%M:%S', time.gmtime(sec))
+        _ts_cache = (sec, prefix)
+    return f"{prefix}.{int((now - sec) * 1e6):06d}+00:00"
+
 
 class EventType(str, Enum):
     # Run lifecycle
@@ -47,6 +101,7 @@ class EventType(str, Enum):
     COLLECTOR_STOPPED = "collector_stopped"
     COLLECTOR_OUTPUT = "collector_output"
     COLLECTOR_ERROR = "collector_error"
+    COLLECTOR_BACKPRESSURE = "collector_backpressure"
     
     # Connection
     CONNECTION_ESTABLISHED = "connection_established"
@@ -62,25 +117,91 @@ class EventType(str, Enum):
     ERROR = "error"
 
 
-@dataclass
+# Plain-str aliases of the EventType values, for hot paths that compare or
+# pass event types without going through the Enum
+RUN_STARTED = EventType.RUN_STARTED.value
+RUN_PAUSED = EventType.RUN_PAUSED.value
+RUN_RESUMED = EventType.RUN_RESUMED.value
+RUN_COMPLETED = EventType.RUN_COMPLETED.value
+RUN_INTERRUPTED = EventType.RUN_INTERRUPTED.value
+STAGE_STARTED = EventType.STAGE_STARTED.value
+STAGE_COMPLETED = EventType.STAGE_COMPLETED.value
+ACTION_STARTED = EventType.ACTION_STARTED.value
+ACTION_COMPLETED = EventType.ACTION_COMPLETED.value
+ACTION_FAILED = EventType.ACTION_FAILED.value
+COMMAND_STARTED = EventType.COMMAND_STARTED.value
+COMMAND_OUTPUT = EventType.COMMAND_OUTPUT.value
+COMMAND_COMPLETED = EventType.COMMAND_COMPLETED.value
+COMMAND_FAILED = EventType.COMMAND_FAILED.value
+ARTIFACT_PULL_STARTED = EventType.ARTIFACT_PULL_STARTED.value
+ARTIFACT_PULLED = EventType.ARTIFACT_PULLED.value
+ARTIFACT_PULL_FAILED = EventType.ARTIFACT_PULL_FAILED.value
+COLLECTOR_STARTED = EventType.COLLECTOR_STARTED.value
+COLLECTOR_STOPPED = EventType.COLLECTOR_STOPPED.value
+COLLECTOR_OUTPUT = EventType.COLLECTOR_OUTPUT.value
+COLLECTOR_ERROR = EventType.COLLECTOR_ERROR.value
+COLLECTOR_BACKPRESSURE = EventType.COLLECTOR_BACKPRESSURE.value
+CONNECTION_ESTABLISHED = EventType.CONNECTION_ESTABLISHED.value
+CONNECTION_LOST = EventType.CONNECTION_LOST.value
+CONNECTION_RETRY = EventType.CONNECTION_RETRY.value
+NOTE = EventType.NOTE.value
+EDIT = EventType.EDIT.value
+PARAMETER_SET = EventType.PARAMETER_SET.value
+ERROR = EventType.ERROR.value
+
+
 class Event:
     """Represents a single immutable event in the stream."""
-    seq: int
-    timestamp: str
-    event_type: str
-    data: Dict[str, Any]
-    user: Optional[Dict[str, str]] = None  # {username, color} of who triggered
+    
+    # Slotted: streams can hold many thousands of these in memory
+    __slots__ = ('seq', 'timestamp', 'event_type', 'data', 'user')
+    
+    def __init__(
+        self,
+        seq: int,
+        timestamp: str,
+        event_type: str,
+        data: Dict[str, Any],
+        user: Optional[Dict[str, str]] = None  # {username, color} of who triggered
+    ):
+        self.seq = seq
+        self.timestamp = timestamp
+        self.event_type = event_type
+        self.data = data
+        self.user = user
+    
+    def __repr__(self) -> str:
+        return (f"Event(seq={self.seq!r}, timestamp={self.timestamp!r}, "
+                f"event_type={self.event_type!r}, data={self.data!r}, user={self.user!r})")
+    
+    def __eq__(self, other) -> bool:
+        if not isinstance(other, Event):
+            return NotImplemented
+        return self.to_dict() == other.to_dict()
+    
+    __hash__ = None
+    
+    def to_dict(self) -> Dict[str, Any]:
+        d = {
+            'seq': self.seq,
+            'timestamp': self.timestamp,
+            'event_type': self.event_type,
+            'data': self.data
+        }
+        # Leave out a None user to keep JSON clean
+        if self.user is not None:
+            d['user'] = self.user
+        return d
     
     def to_json(self) -> str:
-        d = asdict(self)
-        # Remove None user to keep JSON clean
-        if d['user'] is None:
-            del d['user']
-        return json.dumps(d, ensure_ascii=False)
+        return self.to_json_bytes().decode('utf-8')
+    
+    def to_json_bytes(self) -> bytes:
+        return _dumps(self.to_dict())
     
     @classmethod
-    def from_json(cls, line: str) -> 'Event':
-        d = json.loads(line)
+    def from_json(cls, line) -> 'Event':
+        d = _loads(line)
         return cls(
             seq=d['seq'],
             timestamp=d['timestamp'],
@@ -90,20 +211,196 @@ class Event:
         )
 
 
+# Writer queue item kinds
+_WRITE = 0
+_BARRIER = 1
+_SYNC = 2
+
+
+class _EventWriter:
+    """
+    Single background thread that owns all event file I/O.
+    
+    EventStream.append only queues the serialized line; this thread puts
+    each stream's lines back in seq order (producers take seqs without a
+    lock, so they can arrive out of order), pushes each batch to the OS so
+    readers see it, and fsyncs every FLUSH_INTERVAL (or on request) as one
+    group commit across all streams.
+    """
+    
+    def __init__(self):
+        self._queue: "queue.SimpleQueue" = queue.SimpleQueue()
+        self._start_lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+    
+    def _ensure_started(self):
+        if self._thread is None:
+            with self._start_lock:
+                if self._thread is None:
+                    self._thread = threading.Thread(target=self._run, daemon=True)
+                    self._thread.start()
+    
+    def submit(self, stream: 'EventStream', seq: int, line: bytes):
+        """Queue a line for writing; returns immediately."""
+        self._ensure_started()
+        self._queue.put((_WRITE, stream, seq, line))
+    
+    def sync(self, timeout: Optional[float] = None) -> bool:
+        """Block until everything queued so far is written and fsync'd."""
+        return self._wait(_SYNC, None, timeout)
+    
+    def barrier(self, stream: 'EventStream'):
+        """Block until everything queued so far for stream is in the file."""
+        self._wait(_BARRIER, stream, None)
+    
+    def _wait(self, kind: int, stream: Optional['EventStream'], timeout: Optional[float]) -> bool:
+        if self._thread is None:
+            return True
+        done = threading.Event()
+        self._queue.put((kind, stream, 0, done))
+        return done.wait(timeout)
+    
+    def _run(self):
+        dirty = set()
+        gapped = set()
+        barriers = []
+        syncs = []
+        last_sync = time.monotonic()
+        while True:
+            timeout = None
+            if dirty:
+                timeout = max(0.0, last_sync + FLUSH_INTERVAL - time.monotonic())
+            try:
+                batch = [self._queue.get(timeout=timeout)]
+            except queue.Empty:
+                batch = []
+            while True:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            touched = set()
+            for kind, stream, seq, payload in batch:
+                if kind == _WRITE:
+                    heapq.heappush(stream._pending, (seq, payload))
+                    touched.add(stream)
+                elif kind == _BARRIER:
+                    barriers.append((stream, payload))
+                else:
+                    syncs.append(payload)
+            
+            for stream in touched | gapped:
+                wrote = False
+                pending = stream._pending
+                while pending and pending[0][0] == stream._written_seq + 1:
+                    seq, line = heapq.heappop(pending)
+                    try:
+                        stream._write(line)
+                        wrote = True
+                    except (OSError, ValueError) as e:
+                        print(f"Event write failed for {stream.filepath}: {e}")
+                    stream._written_seq = seq
+                if wrote:
+                    try:
+                        stream._flush_os()
+                    except (OSError, ValueError) as e:
+                        print(f"Event flush failed for {stream.filepath}: {e}")
+                    dirty.add(stream)
+            # A stream is gapped while a producer holds a seq it hasn't queued yet
+            gapped = {stream for stream in touched | gapped if stream._pending}
+            
+            if barriers:
+                waiting = []
+                for stream, done in barriers:
+                    if stream in gapped:
+                        waiting.append((stream, done))
+                    else:
+                        done.set()
+                barriers = waiting
+            
+            if (syncs and not gapped) or (dirty and time.monotonic() - last_sync >= FLUSH_INTERVAL):
+                for stream in dirty:
+                    try:
+                        stream._fsync()
+                    except (OSError, ValueError):
+                        pass
+                dirty.clear()
+                last_sync = time.monotonic()
+                if not gapped:
+                    for done in syncs:
+                        done.set()
+                    syncs = []
+
+
+_writer = _EventWriter()
+atexit.register(_writer.sync, EXIT_FLUSH_TIMEOUT)
+
+
 class EventStream:
     """
     Append-only event stream backed by a JSONL file.
     Thread-safe for concurrent writes.
+    
+    append() only assigns the seq and queues the line; a shared writer
+    thread does the file I/O and group-commits fsyncs every FLUSH_INTERVAL.
+    Readers wait for queued events to be written, so they always see
+    everything appended before the read. Pass force_flush=True for events
+    that must be durable before returning.
     """
     
     def __init__(self, filepath: str):
         self.filepath = filepath
-        self._lock = threading.Lock()
-        self._seq = 0
+        # Touched only by the writer thread (and close)
+        self._io_lock = threading.Lock()
+        self._fh = None
+        self._size = 0
+        # Byte offset of each line, loaded on the first after_seq read and
+        # then kept current (in memory and in the sidecar) by _write
+        self._offsets: Optional[array] = None
+        self._idx_fh = None
         
         # Initialize sequence from existing file
-        if os.path.exists(filepath):
-            self._seq = self._count_events()
+        last_seq = self._recover_seq() if os.path.exists(filepath) else 0
+        # Seqs are handed out without a lock (next() on a count is atomic
+        # under the GIL); the writer restores order using _pending
+        self._seq_counter = itertools.count(last_seq + 1)
+        # Writer-thread state: last seq in the file, out-of-order arrivals
+        self._written_seq = last_seq
+        self._pending: list = []
+        # Roughly the last seq handed out; only used to estimate the backlog
+        self._issued_seq = last_seq
+        self._shedding = False
+    
+    def _recover_seq(self) -> int:
+        """
+        Recover the last sequence number from the final line of the file.
+        Falls back to a full count if the tail can't be parsed.
+        """
+        try:
+            for line in self._iter_lines_reversed():
+                return _loads(line)['seq']
+            return 0
+        except (OSError, ValueError, KeyError, TypeError):
+            return self._count_events()
+    
+    def _iter_lines_reversed(self) -> Iterator[bytes]:
+        """Yield non-empty lines from last to first, reading back from EOF."""
+        with open(self.filepath, 'rb') as f:
+            pos = f.seek(0, os.SEEK_END)
+            tail = b''
+            while pos > 0:
+                start = max(0, pos - REVERSE_CHUNK_SIZE)
+                f.seek(start)
+                lines = (f.read(pos - start) + tail).split(b'\n')
+                pos = start
+                # The first piece may continue in the previous chunk
+                tail = lines.pop(0) if pos > 0 else b''
+                for line in reversed(lines):
+                    if line.strip():
+                        yield line
+            if tail.strip():
+                yield tail
     
     def _count_events(self) -> int:
         """Count existing events to determine next sequence number."""
@@ -119,62 +416,223 @@ class EventStream:
     
     def append(
         self, 
-        event_type: EventType, 
+        event_type: Union[EventType, str], 
         data: Optional[Dict[str, Any]] = None,
-        user: Optional[Dict[str, str]] = None
-    ) -> Event:
+        user: Optional[Dict[str, str]] = None,
+        force_flush: bool = False
+    ) -> Optional[Event]:
         """
         Append a new event to the stream.
-        Returns the created event.
+        Returns the created event, or None if collector output was dropped
+        because the writer is EVENT_BACKLOG_LIMIT events behind.
         
         Args:
-            event_type: Type of event
+            event_type: Type of event (EventType or its str value)
             data: Event data payload
             user: Optional user info {username, color} who triggered the event
+            force_flush: fsync before returning instead of at the next group commit
         """
-        with self._lock:
-            self._seq += 1
-            event = Event(
-                seq=self._seq,
-                timestamp=datetime.now(timezone.utc).isoformat(),
-                event_type=event_type.value,
-                data=data or {},
-                user=user
-            )
-            
-            # Append to file
-            with open(self.filepath, 'a', encoding='utf-8') as f:
-                f.write(event.to_json() + '\n')
-                f.flush()
-                os.fsync(f.fileno())
+        event_type = event_type if type(event_type) is str else event_type.value
+        if event_type == COLLECTOR_OUTPUT and self._shed_output():
+            return None
+        
+        event = Event(
+            seq=next(self._seq_counter),
+            timestamp=_utc_timestamp(),
+            event_type=event_type,
+            data=data or {},
+            user=user
+        )
+        self._issued_seq = event.seq
+        try:
+            line = event.to_json_bytes() + b'\n'
+        except Exception as e:
+            # The seq is already taken; fill it so the log stays gapless
+            placeholder = Event(event.seq, event.timestamp, ERROR, {
+                'error': f"Could not serialize {event.event_type} event: {e}"
+            })
+            _writer.submit(self, event.seq, placeholder.to_json_bytes() + b'\n')
+            raise
+        _writer.submit(self, event.seq, line)
+        
+        if force_flush:
+            self.flush()
+        
+        return event
+    
+    def _shed_output(self) -> bool:
+        """
+        Whether collector output should be dropped right now. Logs one
+        COLLECTOR_BACKPRESSURE event each time shedding starts.
+        """
+        backlog = self._issued_seq - self._written_seq
+        if self._shedding:
+            if backlog > EVENT_BACKLOG_LIMIT // 2:
+                return True
+            self._shedding = False
+            return False
+        if backlog < EVENT_BACKLOG_LIMIT:
+            return False
+        self._shedding = True
+        self.append(COLLECTOR_BACKPRESSURE, {'backlog': backlog})
+        return True
+    
+    def flush(self):
+        """Block until appended events are written and fsync'd."""
+        _writer.sync()
+    
+    def _flush_buffer(self):
+        """Wait until appended events are in the file so readers see them."""
+        _writer.barrier(self)
+    
+    def _write(self, data: bytes):
+        with self._io_lock:
+            if self._fh is None:
+                self._fh = open(self.filepath, 'ab', buffering=1 << 16)
+                self._size = self._fh.tell()
+            if self._offsets is not None:
+                self._offsets.append(self._size)
+                self._idx_fh.write(self._offsets[-1:].tobytes())
+            self._fh.write(data)
+            self._size += len(data)
+    
+    def _flush_os(self):
+        with self._io_lock:
+            if self._fh is not None:
+                self._fh.flush()
+            if self._idx_fh is not None:
+                self._idx_fh.flush()
+    
+    def _fsync(self):
+        with self._io_lock:
+            if self._fh is not None:
+                os.fsync(self._fh.fileno())
+    
+    def close(self):
+        """Flush pending events and release the file handle."""
+        self.flush()
+        with self._io_lock:
+            if self._fh is not None:
+                self._fh.close()
+                self._fh = None
+            self._drop_index()
+    
+    def _drop_index(self):
+        if self._idx_fh is not None:
+            self._idx_fh.close()
+            self._idx_fh = None
+        self._offsets = None
+    
+    def _load_index(self):
+        """
+        Load the offset sidecar, rebuilding it with one scan if it is
+        missing or doesn't end exactly at the last line. Caller holds _io_lock.
+        """
+        idx_path = self.filepath + INDEX_SUFFIX
+        offsets = array('Q')
+        try:
+            with open(idx_path, 'rb') as f:
+                raw = f.read()
+            offsets.frombytes(raw[:len(raw) - len(raw) % offsets.itemsize])
+        except OSError:
+            pass
+        
+        with open(self.filepath, 'rb') as f:
+            size = f.seek(0, os.SEEK_END)
+            if offsets and offsets[-1] < size:
+                f.seek(offsets[-1])
+                tail = f.read()
+                valid = tail.endswith(b'\n') and tail.count(b'\n') == 1
+            else:
+                valid = not offsets and size == 0
             
-            return event
+            if not valid:
+                offsets = array('Q')
+                f.seek(0)
+                pos = 0
+                for line in f:
+                    if line.strip():
+                        offsets.append(pos)
+                    pos += len(line)
+                with open(idx_path, 'wb') as idx:
+                    idx.write(offsets.tobytes())
+        
+        self._offsets = offsets
+        self._idx_fh = open(idx_path, 'ab')
+    
+    def _offset_after(self, after_seq: int) -> int:
+        """Byte offset of the line holding seq after_seq + 1."""
+        with self._io_lock:
+            if self._fh is not None:
+                self._fh.flush()
+            if self._offsets is None:
+                self._load_index()
+            if after_seq < len(self._offsets):
+                return self._offsets[after_seq]
+            return self._size if self._fh is not None else os.path.getsize(self.filepath)
     
     def iter_events(self, after_seq: int = 0) -> Iterator[Event]:
         """Iterate over events, optionally starting after a given sequence number."""
+        self._flush_buffer()
         if not os.path.exists(self.filepath):
             return
         
-        with open(self.filepath, 'r', encoding='utf-8') as f:
+        offset = self._offset_after(after_seq) if after_seq > 0 else 0
+        with open(self.filepath, 'rb') as f:
+            f.seek(offset)
+            check = offset > 0
             for line in f:
-                line = line.strip()
-                if line:
-                    event = Event.from_json(line)
-                    if event.seq > after_seq:
-                        yield event
+                if not line.strip():
+                    continue
+                event = Event.from_json(line)
+                if check:
+                    check = False
+                    if event.seq != after_seq + 1:
+                        # Seqs don't line up with lines; fall back to a scan
+                        f.seek(0)
+                        yield from self._scan(f, after_seq)
+                        return
+                if event.seq > after_seq:
+                    yield event
+    
+    def iter_last_events(self, limit: int, before_seq: Optional[int] = None) -> Iterator[Event]:
+        """
+        Iterate over the newest `limit` events (those before before_seq, if
+        given), oldest first. Seeks via the offset index like iter_events.
+        """
+        end = self.current_seq if before_seq is None else before_seq - 1
+        for event in self.iter_events(max(0, end - limit)):
+            if event.seq > end:
+                break
+            yield event
+    
+    @staticmethod
+    def _scan(f, after_seq: int) -> Iterator[Event]:
+        for line in f:
+            if line.strip():
+                event = Event.from_json(line)
+                if event.seq > after_seq:
+                    yield event
     
     def get_all_events(self) -> list[Event]:
         """Get all events as a list."""
         return list(self.iter_events())
     
-    def get_last_event(self, event_type: Optional[EventType] = None) -> Optional[Event]:
+    def get_last_event(self, event_type: Optional[Union[EventType, str]] = None) -> Optional[Event]:
         """Get the most recent event, optionally filtered by type."""
-        events = self.get_all_events()
-        if event_type:
-            events = [e for e in events if e.event_type == event_type.value]
-        return events[-1] if events else None
+        self._flush_buffer()
+        if not os.path.exists(self.filepath):
+            return None
+        
+        wanted = event_type if type(event_type) is str else getattr(event_type, 'value', None)
+        for line in self._iter_lines_reversed():
+            event = Event.from_json(line)
+            if wanted is None or event.event_type == wanted:
+                return event
+        return None
     
     @property
     def current_seq(self) -> int:
-        """Return the current sequence number."""
-        return self._seq
+        """Return the sequence number of the last appended event."""
+        self._flush_buffer()
+        return self._written_seq
@@ -3,12 +3,24 @@ Target profile management for ECR.
 Handles loading, validation, and parameter substitution for profiles.
 """
 
+import hashlib
 import os
 import re
 import yaml
-from typing import Any, Dict, List, Optional
+from concurrent.futures import ThreadPoolExecutor
+from functools import cached_property, lru_cache
+from typing import Any, Dict, List, Optional, Tuple
 from dataclasses import dataclass, field
 
+# libyaml-backed loader/dumper when PyYAML was built with it
+try:
+    from yaml import CSafeLoader as _SafeLoader, CSafeDumper as _SafeDumper
+except ImportError:
+    from yaml import SafeLoader as _SafeLoader, SafeDumper as _SafeDumper
+
+# Below this many profiles load_profiles reads them serially
+LOAD_PROFILES_PARALLEL_MIN = 8
+
 
 @dataclass
 class CommandDefinition:
@@ -52,11 +64,18 @@ class TargetProfile:
     background_collectors: Dict[str, CollectorDefinition]
     filepath: str
     
+    @cached_property
+    def command_names(self) -> Tuple[str, ...]:
+        """Command names in profile order (profiles are cached, so built once)."""
+        return tuple(self.commands)
+    
     @classmethod
     def from_yaml(cls, filepath: str) -> 'TargetProfile':
         """Load a profile from a YAML file."""
-        with open(filepath, 'r', encoding='utf-8') as f:
-            data = yaml.safe_load(f)
+        # Raw bytes: libyaml detects and decodes UTF-8 itself, skipping the
+        # TextIOWrapper decode pass
+        with open(filepath, 'rb') as f:
+            data = yaml.load(f.read(), Loader=_SafeLoader)
         
         # Parse connection
         conn_data = data.get('connection', {})
@@ -136,7 +155,7 @@ class TargetProfile:
     
     def to_yaml(self) -> str:
         """Convert profile to YAML string."""
-        return yaml.dump(self.to_dict(), default_flow_style=False, sort_keys=False)
+        return yaml.dump(self.to_dict(), Dumper=_SafeDumper, default_flow_style=False, sort_keys=False)
 
 
 class ProfileManager:
@@ -145,28 +164,88 @@ class ProfileManager:
     def __init__(self, profiles_dir: str):
         self.profiles_dir = profiles_dir
         os.makedirs(profiles_dir, exist_ok=True)
+        # filepath -> (st_mtime_ns, st_size, parsed profile)
+        self._cache: Dict[str, Tuple[int, int, TargetProfile]] = {}
+        # (profiles_dir st_mtime_ns, sorted names); adding, removing or
+        # renaming a file bumps the directory mtime
+        self._list_cache: Optional[Tuple[int, List[str]]] = None
     
     def list_profiles(self) -> List[str]:
         """List all available profile names."""
+        dir_mtime = os.stat(self.profiles_dir).st_mtime_ns
+        cached = self._list_cache
+        if cached and cached[0] == dir_mtime:
+            return list(cached[1])
+        
         profiles = []
-        for filename in os.listdir(self.profiles_dir):
-            if filename.endswith(('.yaml', '.yml')):
-                profiles.append(filename.rsplit('.', 1)[0])
-        return sorted(profiles)
+        with os.scandir(self.profiles_dir) as entries:
+            for entry in entries:
+                if entry.name.endswith(('.yaml', '.yml')) and entry.is_file():
+                    profiles.append(entry.name.rsplit('.', 1)[0])
+        profiles.sort()
+        self._list_cache = (dir_mtime, profiles)
+        return list(profiles)
     
     def load_profile(self, name: str) -> Optional[TargetProfile]:
-        """Load a profile by name."""
+        """
+        Load a profile by name.
+        Parsed profiles are cached until the file's mtime or size changes.
+        """
         for ext in ('.yaml', '.yml'):
             filepath = os.path.join(self.profiles_dir, name + ext)
-            if os.path.exists(filepath):
-                return TargetProfile.from_yaml(filepath)
+            try:
+                st = os.stat(filepath)
+            except FileNotFoundError:
+                continue
+            
+            cached = self._cache.get(filepath)
+            if cached and cached[0] == st.st_mtime_ns and cached[1] == st.st_size:
+                return cached[2]
+            
+            profile = TargetProfile.from_yaml(filepath)
+            self._cache[filepath] = (st.st_mtime_ns, st.st_size, profile)
+            return profile
         return None
     
+    def load_profiles(self, names: List[str]) -> List[Optional[TargetProfile]]:
+        """Load several profiles by name, in the order given."""
+        # Each load is a stat plus, on a miss, a file read and parse;
+        # overlap them when there are enough profiles for it to matter
+        if len(names) >= LOAD_PROFILES_PARALLEL_MIN:
+            with ThreadPoolExecutor(max_workers=min(32, len(names))) as pool:
+                return list(pool.map(self.load_profile, names))
+        return [self.load_profile(name) for name in names]
+    
+    def profile_etag(self, name: str) -> Optional[str]:
+        """Validator for one profile file, or None if it doesn't exist."""
+        for ext in ('.yaml', '.yml'):
+            try:
+                st = os.stat(os.path.join(self.profiles_dir, name + ext))
+            except FileNotFoundError:
+                continue
+            return f"{ext[1:]}-{st.st_mtime_ns:x}-{st.st_size:x}"
+        return None
+    
+    def listing_etag(self) -> str:
+        """Validator that changes when any profile is added, removed or edited."""
+        digest = hashlib.sha1()
+        for name in self.list_profiles():
+            digest.update(f"{name}\0{self.profile_etag(name)}\n".encode())
+        return digest.hexdigest()
+    
     def save_profile(self, profile: TargetProfile) -> str:
         """Save a profile to disk."""
-        filepath = os.path.join(self.profiles_dir, profile.name + '.yaml')
+        return self.save_profile_yaml(profile.name, profile.to_yaml())
+    
+    def save_profile_yaml(self, name: str, yaml_content: str) -> str:
+        """Write raw YAML for profile `name` and drop its cached entries."""
+        filepath = os.path.join(self.profiles_dir, name + '.yaml')
         with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(profile.to_yaml())
+            f.write(yaml_content)
+        # Don't rely on mtime alone: a same-size rewrite within the
+        # filesystem's timestamp granularity would look unchanged
+        self._cache.pop(filepath, None)
+        self._list_cache = None
         return filepath
     
     def delete_profile(self, name: str) -> bool:
@@ -175,34 +254,64 @@ class ProfileManager:
             filepath = os.path.join(self.profiles_dir, name + ext)
             if os.path.exists(filepath):
                 os.remove(filepath)
+                self._cache.pop(filepath, None)
+                self._list_cache = None
                 return True
         return False
 
 
+# {param_name} placeholder in command and artifact templates
+_PARAM_RE = re.compile(r'\{(\w+)\}')
+
+
+@lru_cache(maxsize=1024)
+def _compile_template(template: str) -> Tuple[str, ...]:
+    """
+    Split a template once into alternating literal text and parameter
+    names: (literal, name, literal, name, ..., literal).
+    """
+    return tuple(_PARAM_RE.split(template))
+
+
 def substitute_parameters(template: str, params: Dict[str, str]) -> str:
     """
     Substitute {param_name} placeholders in a template string.
+    Unknown placeholders are left as-is.
     """
-    def replacer(match):
-        param_name = match.group(1)
-        return params.get(param_name, match.group(0))
-    
-    return re.sub(r'\{(\w+)\}', replacer, template)
+    if '{' not in template:
+        return template
+    parts = _compile_template(template)
+    if len(parts) == 1:
+        return template
+    out = list(parts)
+    for i in range(1, len(parts), 2):
+        name = parts[i]
+        value = params.get(name)
+        out[i] = '{' + name + '}' if value is None else value
+    return ''.join(out)
 
 
 def extract_parameters(template: str) -> List[str]:
     """
-    Extract parameter names from a template string.
+    Extract parameter names from a template string, in first-use order.
     """
-    return list(set(re.findall(r'\{(\w+)\}', template)))
+    if '{' not in template:
+        return []
+    return list(dict.fromkeys(_PARAM_RE.findall(template)))
 
 
 def get_command_parameters(cmd: CommandDefinition) -> List[str]:
     """
     Get all parameter names used in a command and its artifacts.
     """
-    params = set()
-    params.update(extract_parameters(cmd.command))
-    for artifact in cmd.artifacts:
-        params.update(extract_parameters(artifact))
-    return sorted(params)
+    return list(_command_parameters(cmd.command, tuple(cmd.artifacts)))
+
+
+@lru_cache(maxsize=512)
+def _command_parameters(command: str, artifacts: Tuple[str, ...]) -> Tuple[str, ...]:
+    # Keyed on the templates rather than the (mutable) CommandDefinition,
+    # so edited or reloaded profiles never see stale results
+    params = set(_PARAM_RE.findall(command))
+    for artifact in artifacts:
+        params.update(_PARAM_RE.findall(artifact))
+    return tuple(sorted(params))
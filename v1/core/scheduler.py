@@ -0,0 +1,87 @@
+"""
+Delayed task scheduling for ECR.
+Runs periodic work (background collector ticks) on a shared thread pool.
+"""
+
+import heapq
+import itertools
+import threading
+import time
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Callable, List, Optional, Tuple
+
+
+class ScheduledTask:
+    """Handle for a task submitted to a TaskScheduler."""
+    PENDING = 'pending'
+    DISPATCHED = 'dispatched'
+    CANCELLED = 'cancelled'
+
+    __slots__ = ('due', 'fn', 'state', 'future')
+
+    def __init__(self, due: float, fn: Callable[[], None]):
+        self.due = due
+        self.fn = fn
+        self.state = self.PENDING
+        self.future: Optional[Future] = None
+
+
+class TaskScheduler:
+    """
+    Runs callables after a delay on a bounded ThreadPoolExecutor.
+
+    A single timer thread sleeps until the earliest due task and hands it
+    to the pool, so thread count is bounded by max_workers rather than by
+    the number of periodic jobs. Periodic jobs reschedule themselves at the
+    end of each run, which also keeps one job from overlapping itself.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = 'ecr-sched'):
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers, thread_name_prefix=thread_name_prefix
+        )
+        self._heap: List[Tuple[float, int, ScheduledTask]] = []
+        self._counter = itertools.count()
+        self._cond = threading.Condition()
+        self._thread: Optional[threading.Thread] = None
+
+    def schedule(self, delay: float, fn: Callable[[], None]) -> ScheduledTask:
+        """Run fn on the pool after delay seconds."""
+        task = ScheduledTask(time.monotonic() + delay, fn)
+        with self._cond:
+            heapq.heappush(self._heap, (task.due, next(self._counter), task))
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, daemon=True)
+                self._thread.start()
+            self._cond.notify()
+        return task
+
+    def cancel(self, task: Optional[ScheduledTask]) -> bool:
+        """
+        Cancel a task that hasn't been handed to the pool yet.
+        Returns False if it is already running (or ran).
+        """
+        if task is None:
+            return False
+        with self._cond:
+            if task.state != ScheduledTask.PENDING:
+                return False
+            task.state = ScheduledTask.CANCELLED
+            return True
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while True:
+                    while self._heap and self._heap[0][2].state == ScheduledTask.CANCELLED:
+                        heapq.heappop(self._heap)
+                    if not self._heap:
+                        self._cond.wait()
+                        continue
+                    delay = self._heap[0][0] - time.monotonic()
+                    if delay <= 0:
+                        break
+                    self._cond.wait(delay)
+                _, _, task = heapq.heappop(self._heap)
+                task.state = ScheduledTask.DISPATCHED
+                task.future = self._executor.submit(task.fn)
@@ -3,13 +3,28 @@ SSH/SCP client wrapper for ECR.
 Handles remote command execution and file transfer with resilience.
 """
 
+import codecs
 import os
+import select
+import shlex
+import shutil
 import time
 import threading
-from typing import Callable, Optional, Tuple
+from typing import Callable, List, Optional, Tuple
 from dataclasses import dataclass
 import paramiko
-from paramiko import SSHClient, AutoAddPolicy, SFTPClient
+from paramiko import SSHClient, AutoAddPolicy, SFTPClient, Channel
+
+
+# Read size for draining the persistent shell channel
+SHELL_RECV_SIZE = 32768
+
+# Read size for draining exec channels in execute()
+EXEC_RECV_SIZE = 65536
+
+# Local copy buffer sizes for SFTP transfers
+SFTP_GET_CHUNK = 256 * 1024
+SFTP_PUT_CHUNK = 1024 * 1024
 
 
 @dataclass
@@ -56,7 +71,14 @@ class SSHClientWrapper:
         self.config = config
         self._client: Optional[SSHClient] = None
         self._sftp: Optional[SFTPClient] = None
-        self._lock = threading.Lock()
+        # Long-lived remote /bin/sh used by execute_pipelined
+        self._shell: Optional[Channel] = None
+        # Guards _client/_sftp/_connected and reconnects. Reentrant because
+        # _ensure_connected() calls connect(). Commands run outside it: the
+        # transport multiplexes channels, so concurrent execute()s overlap.
+        self._state_lock = threading.RLock()
+        # Serializes use of the single persistent shell channel
+        self._shell_lock = threading.Lock()
         self._connected = False
         
         # Callbacks
@@ -64,13 +86,23 @@ class SSHClientWrapper:
         self._on_disconnect = on_disconnect
         self._on_retry = on_retry
     
+    def set_callbacks(self, on_connect: Optional[Callable[[], None]] = None,
+                      on_disconnect: Optional[Callable[[str], None]] = None,
+                      on_retry: Optional[Callable[[int, str], None]] = None):
+        """Rebind connection callbacks (used when a pooled client changes owner)."""
+        self._on_connect = on_connect
+        self._on_disconnect = on_disconnect
+        self._on_retry = on_retry
+    
     @property
     def is_connected(self) -> bool:
         return self._connected and self._client is not None
     
     def connect(self) -> bool:
         """Establish SSH connection with retry logic."""
-        with self._lock:
+        with self._state_lock:
+            self._close_shell()
+            self._close_sftp()
             for attempt in range(1, self.config.retry_attempts + 1):
                 try:
                     self._client = SSHClient()
@@ -91,6 +123,7 @@ class SSHClientWrapper:
                     
                     self._client.connect(**connect_kwargs)
                     self._connected = True
+                    self._open_sftp()
                     
                     if self._on_connect:
                         self._on_connect()
@@ -114,13 +147,9 @@ class SSHClientWrapper:
     
     def disconnect(self):
         """Close SSH connection."""
-        with self._lock:
-            if self._sftp:
-                try:
-                    self._sftp.close()
-                except:
-                    pass
-                self._sftp = None
+        with self._state_lock:
+            self._close_shell()
+            self._close_sftp()
             
             if self._client:
                 try:
@@ -148,44 +177,186 @@ class SSHClientWrapper:
         
         return True
     
+    def _live_client(self) -> Optional[SSHClient]:
+        """Lock-free read of the client if its transport is up, else None."""
+        client = self._client
+        if not self._connected or client is None:
+            return None
+        transport = client.get_transport()
+        if transport is None or not transport.is_active():
+            return None
+        return client
+    
+    def _connected_client(self) -> Optional[SSHClient]:
+        """Reconnect if needed and return the live client, or None."""
+        # Attribute reads are atomic; only a reconnect needs the lock
+        client = self._live_client()
+        if client is not None:
+            return client
+        with self._state_lock:
+            if not self._ensure_connected():
+                return None
+            return self._client
+    
+    def _get_sftp(self) -> Optional[SFTPClient]:
+        """Return the shared SFTP session, or None if not connected."""
+        sftp = self._sftp
+        if sftp is not None and self._live_client() is not None:
+            return sftp
+        with self._state_lock:
+            if not self._ensure_connected():
+                return None
+            if self._sftp is None:
+                # connect() couldn't open it; surface the real error now
+                self._sftp = self._client.open_sftp()
+                self._sftp.get_channel().settimeout(self.config.timeout)
+            return self._sftp
+    
+    def _open_sftp(self):
+        """
+        Open the SFTP session alongside the connection. Failure is left for
+        _get_sftp() to report, since command-only targets may lack sftp.
+        """
+        try:
+            self._sftp = self._client.open_sftp()
+            self._sftp.get_channel().settimeout(self.config.timeout)
+        except Exception:
+            self._sftp = None
+    
+    def _close_sftp(self):
+        if self._sftp is not None:
+            try:
+                self._sftp.close()
+            except Exception:
+                pass
+            self._sftp = None
+    
     def execute(self, command: str, timeout: Optional[int] = None) -> CommandResult:
         """
         Execute a remote command.
         Returns CommandResult with stdout, stderr, exit code, and timing.
         """
-        with self._lock:
-            if not self._ensure_connected():
-                return CommandResult(
-                    command=command,
-                    exit_code=-1,
-                    stdout="",
-                    stderr="Connection failed",
-                    start_time=time.time(),
-                    end_time=time.time()
-                )
+        client = self._connected_client()
+        if client is None:
+            return CommandResult(
+                command=command,
+                exit_code=-1,
+                stdout="",
+                stderr="Connection failed",
+                start_time=time.time(),
+                end_time=time.time()
+            )
+        
+        return self._exec_command(client, command, timeout)
+    
+    def _exec_command(self, client: SSHClient, command: str,
+                      timeout: Optional[int]) -> CommandResult:
+        """Run command on a fresh exec channel of client's transport."""
+        start_time = time.time()
+        try:
+            stdin, stdout, stderr = client.exec_command(
+                command, 
+                timeout=timeout or self.config.timeout
+            )
+            
+            stdout_str, stderr_str = self._drain_channel(
+                stdout.channel, timeout or self.config.timeout
+            )
+            exit_code = stdout.channel.recv_exit_status()
+            
+            return CommandResult(
+                command=command,
+                exit_code=exit_code,
+                stdout=stdout_str,
+                stderr=stderr_str,
+                start_time=start_time,
+                end_time=time.time()
+            )
+            
+        except Exception as e:
+            self._connected = False
+            return CommandResult(
+                command=command,
+                exit_code=-1,
+                stdout="",
+                stderr=str(e),
+                start_time=start_time,
+                end_time=time.time()
+            )
+    
+    @staticmethod
+    def _drain_channel(channel: Channel, timeout: float) -> Tuple[str, str]:
+        """
+        Read stdout and stderr together until EOF, decoding as chunks arrive.
+        Reading both streams in one loop keeps a chatty stderr from filling
+        its window while we block on stdout. Raises TimeoutError if the
+        streams are not closed within timeout seconds in total, the same
+        deadline _run_in_shell applies.
+        """
+        out_dec = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        err_dec = codecs.getincrementaldecoder('utf-8')(errors='replace')
+        out: List[str] = []
+        err: List[str] = []
+        deadline = time.monotonic() + timeout
+        while True:
+            progressed = False
+            while channel.recv_ready():
+                out.append(out_dec.decode(channel.recv(EXEC_RECV_SIZE)))
+                progressed = True
+            while channel.recv_stderr_ready():
+                err.append(err_dec.decode(channel.recv_stderr(EXEC_RECV_SIZE)))
+                progressed = True
+            if channel.eof_received and not channel.recv_ready() \
+                    and not channel.recv_stderr_ready():
+                # Both streams are closed; the caller waits for the exit status
+                break
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                channel.close()
+                raise TimeoutError(f"Command timed out after {timeout}s")
+            if not progressed:
+                select.select([channel], [], [], remaining)
+        out.append(out_dec.decode(b'', final=True))
+        err.append(err_dec.decode(b'', final=True))
+        return ''.join(out), ''.join(err)
+    
+    def execute_pipelined(self, command: str, timeout: Optional[int] = None) -> CommandResult:
+        """
+        Execute a remote command over a persistent shell channel.
+        Skips the channel open/close round trips execute() pays per command;
+        falls back to execute() if the shell channel can't be opened.
+        
+        The shell runs one command at a time. A call that finds it busy
+        (a collector tick during a command, or another collector) runs on
+        its own exec channel instead of queueing, so concurrent callers
+        proceed in parallel over the shared transport.
+        """
+        client = self._connected_client()
+        if client is None:
+            return CommandResult(
+                command=command,
+                exit_code=-1,
+                stdout="",
+                stderr="Connection failed",
+                start_time=time.time(),
+                end_time=time.time()
+            )
+        
+        if not self._shell_lock.acquire(blocking=False):
+            return self._exec_command(client, command, timeout)
+        try:
+            try:
+                shell = self._open_shell(client)
+            except Exception:
+                return self._exec_command(client, command, timeout)
             
             start_time = time.time()
             try:
-                stdin, stdout, stderr = self._client.exec_command(
-                    command, 
-                    timeout=timeout or self.config.timeout
+                stdout, stderr, exit_code = self._run_in_shell(
+                    shell, command, timeout or self.config.timeout
                 )
-                
-                stdout_str = stdout.read().decode('utf-8', errors='replace')
-                stderr_str = stderr.read().decode('utf-8', errors='replace')
-                exit_code = stdout.channel.recv_exit_status()
-                
-                return CommandResult(
-                    command=command,
-                    exit_code=exit_code,
-                    stdout=stdout_str,
-                    stderr=stderr_str,
-                    start_time=start_time,
-                    end_time=time.time()
-                )
-                
             except Exception as e:
-                self._connected = False
+                self._close_shell()
                 return CommandResult(
                     command=command,
                     exit_code=-1,
@@ -194,65 +365,148 @@ class SSHClientWrapper:
                     start_time=start_time,
                     end_time=time.time()
                 )
+            
+            return CommandResult(
+                command=command,
+                exit_code=exit_code,
+                stdout=stdout.decode('utf-8', errors='replace'),
+                stderr=stderr.decode('utf-8', errors='replace'),
+                start_time=start_time,
+                end_time=time.time()
+            )
+        finally:
+            self._shell_lock.release()
+    
+    def _open_shell(self, client: SSHClient) -> Channel:
+        """Return the persistent shell channel, opening it if needed."""
+        if self._shell is not None and not self._shell.closed \
+                and not self._shell.exit_status_ready():
+            return self._shell
+        self._close_shell()
+        # A plain exec'd shell reading stdin: no pty, so no echo or prompts
+        shell = client.get_transport().open_session()
+        shell.exec_command('/bin/sh')
+        self._shell = shell
+        return shell
+    
+    def _close_shell(self):
+        if self._shell is not None:
+            try:
+                self._shell.close()
+            except Exception:
+                pass
+            self._shell = None
+    
+    def _run_in_shell(self, shell: Channel, command: str, timeout: float) -> Tuple[bytes, bytes, int]:
+        """
+        Run command in the user's login shell (as exec_command would) and
+        read until the end-of-command markers show up on stdout and stderr.
+        """
+        token = os.urandom(8).hex()
+        out_mark = f'\n__ECR_EOC_{token}_'.encode()
+        err_mark = f'\n__ECR_EOE_{token}__\n'.encode()
+        script = (
+            f'"${{SHELL:-/bin/sh}}" -c {shlex.quote(command)} </dev/null; '
+            f"printf '\\n__ECR_EOC_{token}_%d__\\n' $?; "
+            f"printf '\\n__ECR_EOE_{token}__\\n' >&2\n"
+        )
+        shell.sendall(script.encode())
+        
+        out = bytearray()
+        err = bytearray()
+        out_end = err_end = -1
+        deadline = time.monotonic() + timeout
+        while out_end < 0 or err_end < 0:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                # The command may still be running; drop the shell with it
+                self._close_shell()
+                raise TimeoutError(f"Command timed out after {timeout}s")
+            select.select([shell], [], [], min(remaining, 1.0))
+            while shell.recv_ready():
+                out += shell.recv(SHELL_RECV_SIZE)
+            while shell.recv_stderr_ready():
+                err += shell.recv_stderr(SHELL_RECV_SIZE)
+            if out_end < 0:
+                out_end = out.find(out_mark)
+            if err_end < 0:
+                err_end = err.find(err_mark)
+            if (out_end < 0 or err_end < 0) and shell.exit_status_ready() \
+                    and not shell.recv_ready() and not shell.recv_stderr_ready():
+                self._close_shell()
+                raise EOFError("Remote shell exited")
+        
+        tail = out[out_end + len(out_mark):]
+        exit_code = int(tail[:tail.index(b'__')])
+        return bytes(out[:out_end]), bytes(err[:err_end]), exit_code
     
     def get_file(self, remote_path: str, local_path: str) -> Tuple[bool, str]:
         """
         Copy a file from remote to local.
         Returns (success, error_message).
         """
-        with self._lock:
-            if not self._ensure_connected():
+        try:
+            sftp = self._get_sftp()
+            if sftp is None:
                 return False, "Connection failed"
             
-            try:
-                if self._sftp is None:
-                    self._sftp = self._client.open_sftp()
-                
-                # Ensure local directory exists
-                os.makedirs(os.path.dirname(local_path), exist_ok=True)
-                
-                self._sftp.get(remote_path, local_path)
-                return True, ""
-                
-            except FileNotFoundError:
-                return False, f"Remote file not found: {remote_path}"
-            except PermissionError:
-                return False, f"Permission denied: {remote_path}"
-            except Exception as e:
-                return False, str(e)
+            # Ensure local directory exists
+            os.makedirs(os.path.dirname(local_path), exist_ok=True)
+            
+            # Prefetch queues READs for the whole file up front, so the
+            # transfer is bandwidth-bound rather than one RTT per block
+            with sftp.open(remote_path, 'rb') as remote_file:
+                remote_file.prefetch(remote_file.stat().st_size)
+                with open(local_path, 'wb') as local_file:
+                    shutil.copyfileobj(remote_file, local_file, SFTP_GET_CHUNK)
+            return True, ""
+            
+        except FileNotFoundError:
+            return False, f"Remote file not found: {remote_path}"
+        except PermissionError:
+            return False, f"Permission denied: {remote_path}"
+        except Exception as e:
+            return False, str(e)
     
     def put_file(self, local_path: str, remote_path: str) -> Tuple[bool, str]:
         """
         Copy a file from local to remote.
         Returns (success, error_message).
         """
-        with self._lock:
-            if not self._ensure_connected():
+        try:
+            sftp = self._get_sftp()
+            if sftp is None:
                 return False, "Connection failed"
             
-            try:
-                if self._sftp is None:
-                    self._sftp = self._client.open_sftp()
-                
-                self._sftp.put(local_path, remote_path)
-                return True, ""
-                
-            except Exception as e:
-                return False, str(e)
+            # Pipelined writes don't wait for each WRITE to be acked
+            size = os.path.getsize(local_path)
+            with open(local_path, 'rb') as local_file:
+                with sftp.open(remote_path, 'wb') as remote_file:
+                    remote_file.set_pipelined(True)
+                    shutil.copyfileobj(local_file, remote_file, SFTP_PUT_CHUNK)
+            remote_size = sftp.stat(remote_path).st_size
+            if remote_size != size:
+                return False, f"Size mismatch in put: {remote_size} != {size}"
+            return True, ""
+            
+        except Exception as e:
+            return False, str(e)
     
     def file_exists(self, remote_path: str) -> bool:
         """Check if a remote file exists."""
-        with self._lock:
-            if not self._ensure_connected():
+        try:
+            sftp = self._get_sftp()
+            if sftp is None:
                 return False
             
-            try:
-                if self._sftp is None:
-                    self._sftp = self._client.open_sftp()
-                
-                self._sftp.stat(remote_path)
-                return True
-            except FileNotFoundError:
-                return False
-            except:
-                return False
+            sftp.stat(remote_path)
+            return True
+        except (FileNotFoundError, IOError):
+            # Missing or unreadable path
+            return False
+        except Exception:
+            # Transport failure (SSHException, EOFError): mark the
+            # connection down, as _exec_command does, so the next call's
+            # _ensure_connected() reconnects
+            self._connected = False
+            return False
@@ -0,0 +1,103 @@
+"""
+SSH connection pooling for ECR.
+Reuses live SSH connections across runs that target the same device.
+"""
+
+import threading
+import time
+from collections import deque
+from typing import Callable, Deque, Dict, Optional, Tuple
+
+from .ssh_client import SSHClientWrapper, ConnectionConfig
+
+
+# (host, port, user, key_file, password): a connection is only shared by
+# profiles that would authenticate the same way
+PoolKey = Tuple[str, int, str, Optional[str], Optional[str]]
+
+
+class SSHPool:
+    """
+    Process-wide pool of SSHClientWrappers keyed by target and credentials.
+
+    Runs acquire a wrapper on start and release it on pause/complete instead
+    of disconnecting, so the next run against the same target skips the SSH
+    handshake. Connections left idle longer than idle_timeout are closed by
+    a background reaper thread.
+    """
+
+    def __init__(self, idle_timeout: float = 300.0):
+        self.idle_timeout = idle_timeout
+        self._idle: Dict[PoolKey, Deque[Tuple[float, SSHClientWrapper]]] = {}
+        self._lock = threading.RLock()
+        self._reaper: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+
+    @staticmethod
+    def _key(config: ConnectionConfig) -> PoolKey:
+        return (config.host, config.port, config.user, config.key_file, config.password)
+
+    def acquire(self, config: ConnectionConfig,
+                on_connect: Optional[Callable[[], None]] = None,
+                on_disconnect: Optional[Callable[[str], None]] = None,
+                on_retry: Optional[Callable[[int, str], None]] = None) -> SSHClientWrapper:
+        """
+        Get a client for config, reusing an idle connection when one exists.
+        The callbacks are bound to the client until it is released.
+        """
+        client = None
+        with self._lock:
+            idle = self._idle.get(self._key(config))
+            while idle:
+                _, candidate = idle.pop()  # most recently used first
+                if candidate.is_connected:
+                    client = candidate
+                    break
+                candidate.disconnect()
+
+        if client is None:
+            client = SSHClientWrapper(config)
+        else:
+            # Keep the live connection but pick up timeout/retry settings
+            client.config = config
+        client.set_callbacks(on_connect, on_disconnect, on_retry)
+        return client
+
+    def release(self, client: SSHClientWrapper):
+        """Return a client to the pool; dead connections are just closed."""
+        client.set_callbacks(None, None, None)
+        if not client.is_connected:
+            client.disconnect()
+            return
+
+        with self._lock:
+            self._idle.setdefault(self._key(client.config), deque()).append(
+                (time.monotonic(), client)
+            )
+            if self._reaper is None:
+                self._reaper = threading.Thread(target=self._reap_loop, daemon=True)
+                self._reaper.start()
+
+    def _reap_loop(self):
+        """Close connections that have sat idle longer than idle_timeout."""
+        while not self._stop.wait(max(1.0, self.idle_timeout / 2)):
+            cutoff = time.monotonic() - self.idle_timeout
+            expired = []
+            with self._lock:
+                for key, idle in list(self._idle.items()):
+                    # Oldest releases are at the left
+                    while idle and idle[0][0] < cutoff:
+                        expired.append(idle.popleft()[1])
+                    if not idle:
+                        del self._idle[key]
+            for client in expired:
+                client.disconnect()
+
+    def close_all(self):
+        """Disconnect every idle connection and stop the reaper."""
+        self._stop.set()
+        with self._lock:
+            clients = [c for idle in self._idle.values() for _, c in idle]
+            self._idle.clear()
+        for client in clients:
+            client.disconnect()
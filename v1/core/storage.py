@@ -3,15 +3,56 @@ Storage management for ECR.
 Handles run directory structure, manifests, and archiving.
 """
 
+import hashlib
 import json
 import os
+import re
 import shutil
+import tempfile
+import threading
 import zipfile
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime, timezone
-from typing import Any, Dict, List, Optional
-from dataclasses import dataclass, field, asdict
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+from dataclasses import dataclass, field
 from enum import Enum
 
+try:
+    import orjson
+except ImportError:  # optional; stdlib json is used instead
+    orjson = None
+
+
+if orjson is not None:
+    def _dumps_bytes(obj) -> bytes:
+        return orjson.dumps(obj, option=orjson.OPT_INDENT_2)
+    def _dumps(obj) -> str:
+        return _dumps_bytes(obj).decode('utf-8')
+    _loads = orjson.loads
+else:
+    def _dumps(obj) -> str:
+        return json.dumps(obj, indent=2, ensure_ascii=False)
+    def _dumps_bytes(obj) -> bytes:
+        return _dumps(obj).encode('utf-8')
+    _loads = json.loads
+
+
+# Below this many run directories list_runs loads manifests serially
+LIST_RUNS_PARALLEL_MIN = 8
+
+# Already-compressed formats the run archive stores instead of deflating
+_COMPRESSED_EXTS = frozenset({
+    '.gz', '.tgz', '.xz', '.txz', '.bz2', '.zst', '.lz4', '.zip', '.7z',
+    '.png', '.jpg', '.jpeg', '.gif', '.webp', '.mp4', '.mkv', '.webm',
+})
+
+# Read size when streaming files into a run archive
+ARCHIVE_COPY_CHUNK = 1024 * 1024
+
+# Characters replaced with '-' in run-name suffixes (\w is Unicode-aware,
+# matching the str.isalnum() rule used before)
+_UNSAFE_NAME_RE = re.compile(r'[^\w-]')
+
 
 class RunStatus(str, Enum):
     CREATED = "created"
@@ -38,18 +79,59 @@ class RunManifest:
     notes: str = ""
     
     def to_dict(self) -> Dict[str, Any]:
-        return asdict(self)
+        """Field dict for serialization; containers are shared, not copied."""
+        return {
+            'run_id': self.run_id,
+            'name': self.name,
+            'profile_name': self.profile_name,
+            'status': self.status,
+            'created_at': self.created_at,
+            'started_at': self.started_at,
+            'completed_at': self.completed_at,
+            'parameters': self.parameters,
+            'selected_commands': self.selected_commands,
+            'artifacts': self.artifacts,
+            'notes': self.notes,
+        }
     
     @classmethod
     def from_dict(cls, data: Dict[str, Any]) -> 'RunManifest':
         return cls(**data)
     
     def to_json(self) -> str:
-        return json.dumps(self.to_dict(), indent=2, ensure_ascii=False)
+        return _dumps(self.to_dict())
     
     @classmethod
     def from_json(cls, json_str: str) -> 'RunManifest':
-        return cls.from_dict(json.loads(json_str))
+        return cls.from_dict(_loads(json_str))
+
+
+class _ArchiveSink:
+    """
+    Unseekable zip output (zipfile falls back to data descriptors) that
+    writes through to the archive file and keeps a copy of the bytes for
+    the streaming response.
+    """
+    
+    def __init__(self, fh):
+        self._fh = fh
+        self._chunks: List[bytes] = []
+        self.pending = 0
+    
+    def write(self, data) -> int:
+        self._fh.write(data)
+        self._chunks.append(bytes(data))
+        self.pending += len(data)
+        return len(data)
+    
+    def flush(self):
+        self._fh.flush()
+    
+    def drain(self) -> bytes:
+        data = b''.join(self._chunks)
+        self._chunks.clear()
+        self.pending = 0
+        return data
 
 
 class RunStorage:
@@ -64,6 +146,10 @@ class RunStorage:
         self.manifest_path = os.path.join(run_dir, 'manifest.json')
         self.events_path = os.path.join(run_dir, 'events.jsonl')
         self.profile_snapshot_path = os.path.join(run_dir, 'profile_snapshot.yaml')
+        # Names in artifacts_dir, listed once on first use and kept current
+        # so picking a free name doesn't stat every candidate
+        self._artifact_names: Optional[set] = None
+        self._artifact_lock = threading.Lock()
     
     def initialize(self, manifest: RunManifest, profile_yaml: str):
         """Initialize run directory structure."""
@@ -82,54 +168,161 @@ class RunStorage:
         open(self.events_path, 'a').close()
     
     def save_manifest(self, manifest: RunManifest):
-        """Save manifest to disk."""
-        with open(self.manifest_path, 'w', encoding='utf-8') as f:
-            f.write(manifest.to_json())
+        """Save manifest to disk, atomically replacing the previous one."""
+        tmp_path = self.manifest_path + '.tmp'
+        with open(tmp_path, 'wb') as f:
+            f.write(_dumps_bytes(manifest.to_dict()))
+        os.replace(tmp_path, self.manifest_path)
     
     def load_manifest(self) -> Optional[RunManifest]:
         """Load manifest from disk."""
         if not os.path.exists(self.manifest_path):
             return None
-        with open(self.manifest_path, 'r', encoding='utf-8') as f:
-            return RunManifest.from_json(f.read())
+        with open(self.manifest_path, 'rb') as f:
+            return RunManifest.from_dict(_loads(f.read()))
     
     def add_artifact(self, local_path: str, original_remote_path: str) -> str:
         """
         Add an artifact to the run.
         Returns the path within the artifacts directory.
         """
-        filename = os.path.basename(local_path)
-        # Handle duplicate filenames
-        dest_path = os.path.join(self.artifacts_dir, filename)
-        counter = 1
-        while os.path.exists(dest_path):
-            name, ext = os.path.splitext(filename)
-            dest_path = os.path.join(self.artifacts_dir, f"{name}_{counter}{ext}")
-            counter += 1
-        
+        dest_path = os.path.join(self.artifacts_dir,
+                                 self._claim_artifact_name(os.path.basename(local_path)))
         shutil.copy2(local_path, dest_path)
         return os.path.relpath(dest_path, self.run_dir)
     
+    def reserve_artifact_path(self, remote_path: str) -> str:
+        """
+        Claim a unique file in the artifacts directory for remote_path.
+        The empty file is created exclusively so concurrent pulls of the same
+        basename can't pick the same name; the caller writes into it.
+        """
+        filename = os.path.basename(remote_path.rstrip('/')) or 'artifact'
+        while True:
+            dest_path = os.path.join(self.artifacts_dir, self._claim_artifact_name(filename))
+            try:
+                os.close(os.open(dest_path, os.O_CREAT | os.O_EXCL | os.O_WRONLY, 0o644))
+                return dest_path
+            except FileExistsError:
+                # Created behind our back; the name is now in the set
+                continue
+    
+    def _claim_artifact_name(self, filename: str) -> str:
+        """Pick filename, or name_N.ext if taken, and record it as used."""
+        with self._artifact_lock:
+            names = self._artifact_names
+            if names is None:
+                os.makedirs(self.artifacts_dir, exist_ok=True)
+                names = self._artifact_names = set(os.listdir(self.artifacts_dir))
+            candidate = filename
+            if candidate in names:
+                name, ext = os.path.splitext(filename)
+                counter = 1
+                while f"{name}_{counter}{ext}" in names:
+                    counter += 1
+                candidate = f"{name}_{counter}{ext}"
+            names.add(candidate)
+            return candidate
+    
+    def register_artifact(self, local_path: str) -> str:
+        """
+        Return the run-relative path for an artifact already written in place
+        (see reserve_artifact_path).
+        """
+        return os.path.relpath(local_path, self.run_dir)
+    
     def get_artifact_path(self, relative_path: str) -> str:
         """Get full path to an artifact."""
         return os.path.join(self.run_dir, relative_path)
     
-    def create_archive(self) -> str:
+    def iter_archive(self) -> Iterator[bytes]:
         """
-        Create a zip archive of the entire run.
-        Returns the path to the archive.
+        Yield the run's zip archive as it is built, for streaming responses.
+        The bytes are also written to archive_path, so a repeat download of
+        an unchanged run is served from disk.
         """
+        entries, comment = self._archive_entries()
+        if self._archive_is_current(comment):
+            with open(self.archive_path, 'rb') as f:
+                while True:
+                    chunk = f.read(ARCHIVE_COPY_CHUNK)
+                    if not chunk:
+                        return
+                    yield chunk
+        yield from self._build_archive(entries, comment)
+    
+    @property
+    def archive_path(self) -> str:
         archive_name = os.path.basename(self.run_dir)
-        archive_path = os.path.join(os.path.dirname(self.run_dir), f"{archive_name}.zip")
-        
-        with zipfile.ZipFile(archive_path, 'w', zipfile.ZIP_DEFLATED) as zf:
-            for root, dirs, files in os.walk(self.run_dir):
-                for file in files:
-                    file_path = os.path.join(root, file)
-                    arcname = os.path.relpath(file_path, os.path.dirname(self.run_dir))
-                    zf.write(file_path, arcname)
-        
-        return archive_path
+        return os.path.join(os.path.dirname(self.run_dir), f"{archive_name}.zip")
+    
+    def _archive_entries(self) -> Tuple[List[Tuple[str, str]], bytes]:
+        """Return [(file_path, arcname)] and the run's fingerprint comment."""
+        parent_dir = os.path.dirname(self.run_dir)
+        entries = []
+        fingerprint = hashlib.sha1()
+        for root, dirs, files in os.walk(self.run_dir):
+            for file in files:
+                # Event offset index is derived and rebuilt on demand
+                if file.endswith('.jsonl.idx'):
+                    continue
+                file_path = os.path.join(root, file)
+                arcname = os.path.relpath(file_path, parent_dir)
+                st = os.stat(file_path)
+                fingerprint.update(f"{arcname}\0{st.st_size}\0{st.st_mtime_ns}\n".encode())
+                entries.append((file_path, arcname))
+        # Stored as the zip comment; stats are taken before any file is read,
+        # so a write racing the build changes the next fingerprint
+        return entries, b'ecr:' + fingerprint.hexdigest().encode()
+    
+    def _archive_is_current(self, comment: bytes) -> bool:
+        try:
+            with zipfile.ZipFile(self.archive_path) as existing:
+                return existing.comment == comment
+        except (OSError, zipfile.BadZipFile):
+            return False
+    
+    def _build_archive(self, entries: List[Tuple[str, str]], comment: bytes) -> Iterator[bytes]:
+        """
+        Write the archive to a temp file and rename it over archive_path,
+        yielding the zip bytes as they are produced.
+        """
+        # A private temp file per build: concurrent builds and downloads
+        # never see a half-written archive
+        fd, tmp_path = tempfile.mkstemp(suffix='.zip.tmp', dir=os.path.dirname(self.run_dir))
+        done = False
+        try:
+            os.fchmod(fd, 0o644)
+            with os.fdopen(fd, 'wb') as fh:
+                sink = _ArchiveSink(fh)
+                with zipfile.ZipFile(sink, 'w', zipfile.ZIP_DEFLATED) as zf:
+                    zf.comment = comment
+                    for file_path, arcname in entries:
+                        ext = os.path.splitext(file_path)[1].lower()
+                        zinfo = zipfile.ZipInfo.from_file(file_path, arcname)
+                        zinfo.compress_type = zipfile.ZIP_STORED if ext in _COMPRESSED_EXTS else zipfile.ZIP_DEFLATED
+                        # ZipFile.write copies in 8 KiB reads; stream larger blocks
+                        with open(file_path, 'rb') as src, zf.open(zinfo, 'w') as dst:
+                            while True:
+                                chunk = src.read(ARCHIVE_COPY_CHUNK)
+                                if not chunk:
+                                    break
+                                dst.write(chunk)
+                                if sink.pending:
+                                    yield sink.drain()
+                        if sink.pending:
+                            yield sink.drain()
+                if sink.pending:
+                    yield sink.drain()
+            os.replace(tmp_path, self.archive_path)
+            done = True
+        finally:
+            # Also reached when a streaming client disconnects mid-download
+            if not done:
+                try:
+                    os.remove(tmp_path)
+                except OSError:
+                    pass
 
 
 class StorageManager:
@@ -146,8 +339,8 @@ class StorageManager:
         timestamp = datetime.now().strftime('%Y-%m-%d_%H%M%S')
         if name:
             # Sanitize name
-            safe_name = "".join(c if c.isalnum() or c in '-_' else '-' for c in name)
-            safe_name = safe_name[:50]  # Limit length
+            # Mapping is 1:1 per character, so truncate first
+            safe_name = _UNSAFE_NAME_RE.sub('-', name[:50])
             return f"{timestamp}_{safe_name}"
         return timestamp
     
@@ -160,6 +353,10 @@ class StorageManager:
     
     def get_run(self, run_id: str) -> Optional[RunStorage]:
         """Get storage for an existing run."""
+        # Ids are generated from [\w-]; anything that could name runs_dir
+        # itself or step outside it is not a run
+        if not run_id or run_id[0] == '.' or '/' in run_id or os.sep in run_id:
+            return None
         run_dir = os.path.join(self.runs_dir, run_id)
         if os.path.exists(run_dir):
             return RunStorage(run_dir)
@@ -167,27 +364,43 @@ class StorageManager:
     
     def list_runs(self) -> List[Dict[str, Any]]:
         """List all runs with basic metadata."""
+        # scandir's d_type answers is_dir() without a stat per entry
+        with os.scandir(self.runs_dir) as it:
+            run_dirs = [entry.path for entry in it if entry.is_dir()]
+        
+        # Manifest loads are small independent reads; overlap them when
+        # there are enough runs for it to matter
+        if len(run_dirs) >= LIST_RUNS_PARALLEL_MIN:
+            with ThreadPoolExecutor(max_workers=min(32, len(run_dirs))) as pool:
+                manifests = list(pool.map(self._load_run_manifest, run_dirs))
+        else:
+            manifests = [self._load_run_manifest(run_dir) for run_dir in run_dirs]
+        
         runs = []
-        for entry in os.listdir(self.runs_dir):
-            run_dir = os.path.join(self.runs_dir, entry)
-            if os.path.isdir(run_dir):
-                storage = RunStorage(run_dir)
-                manifest = storage.load_manifest()
-                if manifest:
-                    runs.append({
-                        'run_id': manifest.run_id,
-                        'name': manifest.name,
-                        'profile_name': manifest.profile_name,
-                        'status': manifest.status,
-                        'created_at': manifest.created_at,
-                        'started_at': manifest.started_at,
-                        'completed_at': manifest.completed_at
-                    })
+        for manifest in manifests:
+            if manifest:
+                runs.append({
+                    'run_id': manifest.run_id,
+                    'name': manifest.name,
+                    'profile_name': manifest.profile_name,
+                    'status': manifest.status,
+                    'created_at': manifest.created_at,
+                    'started_at': manifest.started_at,
+                    'completed_at': manifest.completed_at
+                })
         
         # Sort by creation time, newest first
         runs.sort(key=lambda x: x['created_at'], reverse=True)
         return runs
     
+    @staticmethod
+    def _load_run_manifest(run_dir: str) -> Optional[RunManifest]:
+        try:
+            with open(os.path.join(run_dir, 'manifest.json'), 'rb') as f:
+                return RunManifest.from_dict(_loads(f.read()))
+        except FileNotFoundError:
+            return None
+    
     def delete_run(self, run_id: str) -> bool:
         """Delete a run directory."""
         run_dir = os.path.join(self.runs_dir, run_id)
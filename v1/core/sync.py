@@ -5,7 +5,7 @@ Uses Flask-SocketIO for WebSocket communication.
 
 import json
 from datetime import datetime, timezone
-from typing import Dict, Set, Optional, Any
+from typing import Dict, List, Set, Optional, Any
 from dataclasses import dataclass, field
 from flask_socketio import SocketIO, emit, join_room, leave_room
 from flask import request
@@ -214,6 +214,13 @@ class SyncManager:
         """Broadcast a new timeline event to all users in a run."""
         self.socketio.emit('new_event', event, room=run_id)
     
+    def broadcast_new_events(self, run_id: str, events: List[dict]):
+        """Broadcast a burst of timeline events to a run as one message."""
+        if len(events) == 1:
+            self.socketio.emit('new_event', events[0], room=run_id)
+        else:
+            self.socketio.emit('new_events', {'batch': events}, room=run_id)
+    
     def broadcast_status_change(self, run_id: str, status: str):
         """Broadcast run status change."""
         self.socketio.emit('status_changed', {'status': status}, room=run_id)
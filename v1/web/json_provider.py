@@ -0,0 +1,39 @@
+"""
+orjson-backed JSON provider for the ECR Flask app.
+Importing this module raises ImportError when orjson isn't installed.
+"""
+
+import orjson
+from flask.json.provider import DefaultJSONProvider
+
+
+# Dates and dataclasses go through Flask's own default() so responses
+# look the same as with the stdlib provider (HTTP dates, not RFC 3339)
+_BASE_OPTIONS = (
+    orjson.OPT_NON_STR_KEYS
+    | orjson.OPT_PASSTHROUGH_DATETIME
+    | orjson.OPT_PASSTHROUGH_DATACLASS
+)
+
+
+class OrjsonProvider(DefaultJSONProvider):
+    """
+    Encode and decode with orjson; falls back to the stdlib provider for
+    arguments orjson has no equivalent for.
+    """
+    
+    def dumps(self, obj, **kwargs) -> str:
+        indent = kwargs.get('indent')
+        if set(kwargs) - {'indent', 'separators'} or indent not in (None, 2):
+            return super().dumps(obj, **kwargs)
+        option = _BASE_OPTIONS
+        if self.sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        return orjson.dumps(obj, default=self.default, option=option).decode('utf-8')
+    
+    def loads(self, s, **kwargs):
+        if kwargs:
+            return super().loads(s, **kwargs)
+        return orjson.loads(s)
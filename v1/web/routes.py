@@ -5,39 +5,198 @@ Supports multi-user collaboration via WebSocket sync.
 
 import os
 import json
+import time
+import threading
 import markdown
+from functools import lru_cache, wraps
+from types import SimpleNamespace
 from flask import (
     Blueprint, render_template, request, jsonify, 
-    redirect, url_for, send_file, Response, session
+    redirect, url_for, send_from_directory, Response, session,
+    make_response, current_app
 )
 from datetime import datetime
+from markupsafe import Markup, escape
 
-# Will be set by app.py
-engine = None
-profile_manager = None
-storage_manager = None
-app_root = None
-sync_manager = None
+try:
+    from gevent import get_hub, sleep as gevent_sleep
+except ImportError:  # served without gevent; blocking calls run inline
+    get_hub = None
+
+try:
+    import cmarkgfm
+    from cmarkgfm.cmark import Options as CmarkOptions
+except ImportError:  # optional; Python-Markdown renders the manual instead
+    cmarkgfm = None
+
+# How long /events holds a request open waiting for new events, and how
+# often a parked gevent request rechecks
+LONG_POLL_TIMEOUT = 25
+LONG_POLL_INTERVAL = 0.1
+
+# Distinguishes this server process in page ETags
+_BOOT_TAG = format(time.time_ns(), 'x')
+
+# Events rendered into the run page; older ones are fetched on demand
+RUN_VIEW_EVENTS = 500
+
+# Browser cache lifetime for downloaded artifacts
+ARTIFACT_MAX_AGE = 86400
+
+# Fallback converter when cmarkgfm isn't installed, reused for every render
+# (extensions load once); the instance isn't thread-safe, hence the lock
+_markdown = markdown.Markdown(extensions=['tables', 'fenced_code'])
+_markdown_lock = threading.Lock()
+
+# Starting YAML offered by the new-profile form
+DEFAULT_PROFILE_YAML = '''name: new-target
+description: "Description of the target device"
+
+connection:
+  host: "192.168.1.100"
+  port: 22
+  user: "root"
+  key_file: "~/.ssh/id_rsa"
+  timeout: 30
+
+commands:
+  local_check:
+    description: "Check local environment"
+    command: "echo 'Running on controller' && pwd"
+    
+  target_info:
+    description: "Get target system info"
+    command: "uname -a && uptime"
+    run: target
+    timeout: 30
+
+background_collectors:
+  system_stats:
+    command: "uptime && free -m"
+    run: target
+    interval: 60
+    timeout: 10
+'''
 
 web = Blueprint('web', __name__)
 
 
-def init_routes(eng, prof_mgr, stor_mgr, root_dir, sync_mgr=None):
-    """Initialize routes with engine and managers."""
-    global engine, profile_manager, storage_manager, app_root, sync_manager
-    engine = eng
-    profile_manager = prof_mgr
-    storage_manager = stor_mgr
-    app_root = root_dir
-    sync_manager = sync_mgr
+def init_routes(app, eng, prof_mgr, stor_mgr, root_dir, sync_mgr=None):
+    """
+    Attach the engine and managers to app for the routes to use.
+    They live on app.extensions rather than module globals, so several app
+    instances can coexist in one process.
+    """
+    app.extensions['ecr'] = SimpleNamespace(
+        engine=eng,
+        profile_manager=prof_mgr,
+        storage_manager=stor_mgr,
+        app_root=root_dir,
+        sync_manager=sync_mgr,
+    )
     
     # Hook up engine to broadcast events via sync_manager
-    if sync_manager:
-        def on_engine_event(run_id, event_dict):
-            """Callback when engine generates an event - broadcast to all clients."""
-            sync_manager.broadcast_new_event(run_id, event_dict)
+    if sync_mgr:
+        def on_engine_events(run_id, events):
+            """Callback when engine generates events - broadcast to all clients."""
+            sync_mgr.broadcast_new_events(run_id, events)
         
-        engine.add_event_callback(on_engine_event)
+        eng.add_event_batch_callback(on_engine_events)
+
+
+def _ecr():
+    """The current app's engine and managers (see init_routes)."""
+    return current_app.extensions['ecr']
+
+
+def _offload(fn, *args, **kwargs):
+    """
+    Run a blocking engine call on gevent's native thread pool.
+    The server isn't monkey-patched, so SSH, subprocess and archive work done
+    inline would stall every other request and socket on the hub meanwhile.
+    Event reads count too: they wait for the writer thread to flush.
+    """
+    if get_hub is None:
+        return fn(*args, **kwargs)
+    return get_hub().threadpool.apply(fn, args, kwargs)
+
+
+def _offload_iter(chunks):
+    """Advance a blocking generator on the thread pool, one item at a time."""
+    try:
+        while True:
+            chunk = _offload(next, chunks, None)
+            if chunk is None:
+                return
+            yield chunk
+    finally:
+        chunks.close()
+
+
+def _page_etag(data_etag):
+    """ETag for a rendered page: its data version plus this server instance,
+    so template changes after a restart aren't masked by a 304."""
+    return f"{_BOOT_TAG}-{data_etag}"
+
+
+def _not_modified(etag):
+    response = Response(status=304)
+    response.set_etag(etag)
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def _with_etag(body, etag):
+    response = make_response(body)
+    response.set_etag(etag)
+    # Cache but revalidate every time, which is cheap with the ETag
+    response.headers['Cache-Control'] = 'no-cache'
+    return response
+
+
+def json_body(required=None, error=None, expect=None):
+    """
+    Parse the request's JSON body once and pass it to the view as `data`.
+    With `required`, answer 400 with `error` when that field is missing or
+    empty (or not an instance of `expect`).
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(*args, **kwargs):
+            data = request.get_json(silent=True)
+            if not isinstance(data, dict):
+                data = {}
+            if required is not None:
+                value = data.get(required)
+                if not value or (expect is not None and not isinstance(value, expect)):
+                    return jsonify({'success': False, 'error': error}), 400
+            return view(*args, data=data, **kwargs)
+        return wrapper
+    return decorator
+
+
+@lru_cache(maxsize=128)
+def _read_text(path, mtime_ns, size):
+    """File contents, cached per (path, mtime, size) so a rewrite misses."""
+    with open(path, 'r', encoding='utf-8') as f:
+        return f.read()
+
+
+@lru_cache(maxsize=4)
+def _render_markdown(path, mtime_ns, size):
+    """Rendered HTML for a markdown file, cached until it is modified."""
+    # One read of the raw bytes and one decode; Markdown needs a str, so an
+    # mmap would only add a copy back out of the mapping
+    with open(path, 'rb') as f:
+        text = f.read().decode('utf-8')
+    if cmarkgfm is not None:
+        # GFM covers tables and fenced code; UNSAFE keeps inline HTML, as
+        # Python-Markdown does
+        return cmarkgfm.github_flavored_markdown_to_html(
+            text, options=CmarkOptions.CMARK_OPT_UNSAFE
+        )
+    with _markdown_lock:
+        return _markdown.reset().convert(text)
 
 
 def get_current_user():
@@ -62,6 +221,7 @@ def get_current_user():
 
 def broadcast_event(run_id: str, event: dict):
     """Broadcast event to all clients viewing this run."""
+    sync_manager = _ecr().sync_manager
     if sync_manager:
         sync_manager.broadcast_new_event(run_id, event)
 
@@ -71,6 +231,9 @@ def broadcast_event(run_id: str, event: dict):
 @web.route('/')
 def dashboard():
     """Main dashboard showing all runs."""
+    ecr = _ecr()
+    profile_manager = ecr.profile_manager
+    storage_manager = ecr.storage_manager
     runs = storage_manager.list_runs()
     profiles = profile_manager.list_profiles()
     return render_template('dashboard.html', runs=runs, profiles=profiles)
@@ -81,13 +244,12 @@ def dashboard():
 @web.route('/manual')
 def manual():
     """Display the configuration guide."""
+    app_root = _ecr().app_root
     config_path = os.path.join(app_root, 'configuration_yaml.md')
-    content = ""
-    if os.path.exists(config_path):
-        with open(config_path, 'r', encoding='utf-8') as f:
-            md_content = f.read()
-        content = markdown.markdown(md_content, extensions=['tables', 'fenced_code'])
-    else:
+    try:
+        st = os.stat(config_path)
+        content = _render_markdown(config_path, st.st_mtime_ns, st.st_size)
+    except FileNotFoundError:
         content = "<p>Configuration guide not found. Create a configuration_yaml.md file in the ECR root directory.</p>"
     return render_template('manual.html', content=content)
 
@@ -97,45 +259,57 @@ def manual():
 @web.route('/profiles')
 def profiles_list():
     """List all profiles."""
-    profiles = []
-    for pname in profile_manager.list_profiles():
-        profile = profile_manager.load_profile(pname)
-        if profile:
-            profiles.append({
-                'name': profile.name,
-                'description': profile.description,
-                'host': profile.connection.host,
-                'commands_count': len(profile.commands),
-                'collectors_count': len(profile.background_collectors)
-            })
-    return render_template('profiles.html', profiles=profiles)
+    profile_manager = _ecr().profile_manager
+    etag = _page_etag(profile_manager.listing_etag())
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    
+    loaded = profile_manager.load_profiles(profile_manager.list_profiles())
+    profiles = [
+        {
+            'name': profile.name,
+            'description': profile.description,
+            'host': profile.connection.host,
+            'commands_count': len(profile.commands),
+            'collectors_count': len(profile.background_collectors)
+        }
+        for profile in loaded if profile
+    ]
+    return _with_etag(render_template('profiles.html', profiles=profiles), etag)
 
 
 @web.route('/profiles/<name>')
 def profile_view(name):
     """View a single profile."""
+    profile_manager = _ecr().profile_manager
+    file_etag = profile_manager.profile_etag(name)
+    if file_etag is None:
+        return "Profile not found", 404
+    etag = _page_etag(file_etag)
+    if request.if_none_match.contains(etag):
+        return _not_modified(etag)
+    
     profile = profile_manager.load_profile(name)
     if not profile:
         return "Profile not found", 404
-    return render_template('profile_view.html', profile=profile)
+    return _with_etag(render_template('profile_view.html', profile=profile), etag)
 
 
 @web.route('/profiles/<name>/edit', methods=['GET', 'POST'])
 def profile_edit(name):
     """Edit a profile."""
+    profile_manager = _ecr().profile_manager
     if request.method == 'POST':
         yaml_content = request.form.get('yaml_content', '')
-        filepath = os.path.join(profile_manager.profiles_dir, name + '.yaml')
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(yaml_content)
+        profile_manager.save_profile_yaml(name, yaml_content)
         return redirect(url_for('web.profile_view', name=name))
     
     profile = profile_manager.load_profile(name)
     if not profile:
         return "Profile not found", 404
     
-    with open(profile.filepath, 'r', encoding='utf-8') as f:
-        yaml_content = f.read()
+    st = os.stat(profile.filepath)
+    yaml_content = _read_text(profile.filepath, st.st_mtime_ns, st.st_size)
     
     return render_template('profile_edit.html', profile=profile, yaml_content=yaml_content)
 
@@ -143,48 +317,20 @@ def profile_edit(name):
 @web.route('/profiles/new', methods=['GET', 'POST'])
 def profile_new():
     """Create a new profile."""
+    profile_manager = _ecr().profile_manager
     if request.method == 'POST':
         name = request.form.get('name', 'new-profile')
         yaml_content = request.form.get('yaml_content', '')
-        filepath = os.path.join(profile_manager.profiles_dir, name + '.yaml')
-        with open(filepath, 'w', encoding='utf-8') as f:
-            f.write(yaml_content)
+        profile_manager.save_profile_yaml(name, yaml_content)
         return redirect(url_for('web.profile_view', name=name))
     
-    template = '''name: new-target
-description: "Description of the target device"
-
-connection:
-  host: "192.168.1.100"
-  port: 22
-  user: "root"
-  key_file: "~/.ssh/id_rsa"
-  timeout: 30
-
-commands:
-  local_check:
-    description: "Check local environment"
-    command: "echo 'Running on controller' && pwd"
-    
-  target_info:
-    description: "Get target system info"
-    command: "uname -a && uptime"
-    run: target
-    timeout: 30
-
-background_collectors:
-  system_stats:
-    command: "uptime && free -m"
-    run: target
-    interval: 60
-    timeout: 10
-'''
-    return render_template('profile_edit.html', profile=None, yaml_content=template)
+    return render_template('profile_edit.html', profile=None, yaml_content=DEFAULT_PROFILE_YAML)
 
 
 @web.route('/api/profiles/<name>', methods=['DELETE'])
 def profile_delete(name):
     """Delete a profile."""
+    profile_manager = _ecr().profile_manager
     if profile_manager.delete_profile(name):
         return jsonify({'success': True})
     return jsonify({'success': False, 'error': 'Profile not found'}), 404
@@ -195,17 +341,17 @@ def profile_delete(name):
 @web.route('/runs/new', methods=['GET', 'POST'])
 def run_new():
     """Create a new run."""
+    ecr = _ecr()
+    engine = ecr.engine
+    profile_manager = ecr.profile_manager
     if request.method == 'POST':
         data = request.form
         profile_name = data.get('profile_name')
         run_name = data.get('name') or None
         
-        parameters = {}
-        param_keys = request.form.getlist('param_key[]')
-        param_values = request.form.getlist('param_value[]')
-        for k, v in zip(param_keys, param_values):
-            if k.strip():
-                parameters[k.strip()] = v
+        # Rows with a blank key are ignored; later duplicates win
+        pairs = zip(data.getlist('param_key[]'), data.getlist('param_value[]'))
+        parameters = {k: v for k, v in ((k.strip(), v) for k, v in pairs) if k}
         
         selected_commands = request.form.getlist('selected_commands[]')
         
@@ -227,7 +373,7 @@ def run_new():
         profile = profile_manager.load_profile(selected_profile)
         if profile:
             profile_data = profile.to_dict()
-            profile_data['commands_list'] = list(profile.commands.keys())
+            profile_data['commands_list'] = profile.command_names
     
     return render_template('run_new.html', 
                           profiles=profiles, 
@@ -238,18 +384,16 @@ def run_new():
 @web.route('/runs/<run_id>')
 def run_view(run_id):
     """View a run."""
+    ecr = _ecr()
+    engine = ecr.engine
+    sync_manager = ecr.sync_manager
     ctx = engine.get_run_context(run_id)
     if not ctx:
         return "Run not found", 404
     
-    events = engine.get_events(run_id)
+    events = _offload(engine.get_events, run_id, limit=RUN_VIEW_EVENTS)
     
-    active_ctx = engine._active_runs.get(run_id)
-    active_collectors = []
-    if active_ctx:
-        active_collectors = [
-            cname for cname, c in active_ctx.collectors.items() if c.running
-        ]
+    active_collectors = engine.get_active_collector_names(run_id)
     
     # Get connected users for this run
     connected_users = []
@@ -267,300 +411,320 @@ def run_view(run_id):
 @web.route('/api/runs/<run_id>/start', methods=['POST'])
 def run_start(run_id):
     """Start or resume a run."""
-    success = engine.start_run(run_id)
+    engine = _ecr().engine
+    success = _offload(engine.start_run, run_id)
     return jsonify({'success': success})
 
 
 @web.route('/api/runs/<run_id>/pause', methods=['POST'])
 def run_pause(run_id):
     """Pause a run."""
-    success = engine.pause_run(run_id)
+    engine = _ecr().engine
+    success = _offload(engine.pause_run, run_id)
     return jsonify({'success': success})
 
 
 @web.route('/api/runs/<run_id>/complete', methods=['POST'])
 def run_complete(run_id):
     """Complete a run."""
-    success = engine.complete_run(run_id)
+    engine = _ecr().engine
+    success = _offload(engine.complete_run, run_id)
     return jsonify({'success': success})
 
 
 @web.route('/api/runs/<run_id>/command', methods=['POST'])
-def run_execute_command(run_id):
+@json_body('command', 'No command specified')
+def run_execute_command(run_id, data):
     """Execute a command."""
-    data = request.json or {}
-    command_name = data.get('command')
+    ecr = _ecr()
+    engine = ecr.engine
+    sync_manager = ecr.sync_manager
+    command_name = data['command']
     user = data.get('user')  # User info passed from client
     
-    if not command_name:
-        return jsonify({'success': False, 'error': 'No command specified'}), 400
-    
     # Broadcast that command is being executed
     if sync_manager and user:
         sync_manager.broadcast_command_executing(run_id, command_name, user)
     
-    result = engine.execute_command(run_id, command_name, user=user)
+    result = _offload(engine.execute_command, run_id, command_name, user=user)
     return jsonify(result)
 
 
-@web.route('/api/runs/<run_id>/parameter', methods=['POST'])
-def run_set_parameter(run_id):
-    """Set a parameter."""
-    data = request.json or {}
-    pname = data.get('name')
-    value = data.get('value', '')
+@web.route('/api/runs/<run_id>/commands', methods=['POST'])
+@json_body('commands', 'No commands specified', expect=list)
+def run_execute_commands(run_id, data):
+    """Execute several commands in order in one request."""
+    ecr = _ecr()
+    engine = ecr.engine
+    sync_manager = ecr.sync_manager
+    command_names = data['commands']
     user = data.get('user')
     
-    if not pname:
-        return jsonify({'success': False, 'error': 'No parameter name specified'}), 400
+    if sync_manager and user:
+        for command_name in command_names:
+            sync_manager.broadcast_command_executing(run_id, command_name, user)
     
-    success = engine.set_parameter(run_id, pname, value, user=user)
+    results = _offload(engine.execute_commands, run_id, command_names, user=user)
+    return jsonify({
+        'success': all(r.get('success') for r in results),
+        'results': results
+    })
+
+
+@web.route('/api/runs/<run_id>/parameter', methods=['POST'])
+@json_body('name', 'No parameter name specified')
+def run_set_parameter(run_id, data):
+    """Set a parameter."""
+    engine = _ecr().engine
+    success = engine.set_parameter(
+        run_id, data['name'], data.get('value', ''), user=data.get('user')
+    )
     return jsonify({'success': success})
 
 
 @web.route('/api/runs/<run_id>/collector/start', methods=['POST'])
-def run_start_collector(run_id):
+@json_body('collector', 'No collector specified')
+def run_start_collector(run_id, data):
     """Start a background collector."""
-    data = request.json or {}
-    collector_name = data.get('collector')
-    
-    if not collector_name:
-        return jsonify({'success': False, 'error': 'No collector specified'}), 400
-    
-    success = engine.start_collector(run_id, collector_name)
+    engine = _ecr().engine
+    success = _offload(engine.start_collector, run_id, data['collector'])
     return jsonify({'success': success})
 
 
+@web.route('/api/runs/<run_id>/collectors/start', methods=['POST'])
+@json_body('collectors', 'No collectors specified', expect=list)
+def run_start_collectors(run_id, data):
+    """Start several background collectors in one request."""
+    engine = _ecr().engine
+    results = _offload(engine.start_collectors, run_id, data['collectors'])
+    return jsonify({'success': all(results.values()), 'results': results})
+
+
 @web.route('/api/runs/<run_id>/collector/stop', methods=['POST'])
-def run_stop_collector(run_id):
+@json_body('collector', 'No collector specified')
+def run_stop_collector(run_id, data):
     """Stop a background collector."""
-    data = request.json or {}
-    collector_name = data.get('collector')
-    
-    if not collector_name:
-        return jsonify({'success': False, 'error': 'No collector specified'}), 400
-    
-    success = engine.stop_collector(run_id, collector_name)
+    engine = _ecr().engine
+    success = _offload(engine.stop_collector, run_id, data['collector'])
     return jsonify({'success': success})
 
 
 @web.route('/api/runs/<run_id>/note', methods=['POST'])
-def run_add_note(run_id):
+@json_body()
+def run_add_note(run_id, data):
     """Add a note to a run."""
-    data = request.json or {}
-    note = data.get('note', '')
-    user = data.get('user')
-    
-    success = engine.add_note(run_id, note, user=user)
+    engine = _ecr().engine
+    success = engine.add_note(run_id, data.get('note', ''), user=data.get('user'))
     return jsonify({'success': success})
 
 
 @web.route('/api/runs/<run_id>/events')
 def run_events(run_id):
-    """Get events for a run (for polling)."""
+    """Get events for a run (for polling), or a page of older ones."""
+    engine = _ecr().engine
+    if 'before' in request.args:
+        events = _offload(
+            engine.get_events,
+            run_id,
+            limit=min(int(request.args.get('limit', RUN_VIEW_EVENTS)), RUN_VIEW_EVENTS),
+            before_seq=int(request.args['before'])
+        )
+        return jsonify({'events': events})
+    
     after_seq = int(request.args.get('after', 0))
-    events = engine.get_events(run_id, after_seq)
-    return jsonify({'events': events})
+    events = _offload(engine.get_events, run_id, after_seq)
+    if not events:
+        events = _wait_for_events(run_id, after_seq)
+    response = jsonify({'events': events})
+    response.headers['Cache-Control'] = 'no-store'
+    response.headers['X-Accel-Buffering'] = 'no'
+    return response
+
+
+def _wait_for_events(run_id, after_seq):
+    """Long-poll: hold the request until new events arrive or the timeout."""
+    engine = _ecr().engine
+    if get_hub is None:
+        return engine.wait_for_events(run_id, after_seq, LONG_POLL_TIMEOUT)
+    # Under gevent, park the greenlet rather than a pool thread per waiting
+    # viewer; the engine's latest seq is an in-memory read
+    deadline = time.monotonic() + LONG_POLL_TIMEOUT
+    while time.monotonic() < deadline:
+        gevent_sleep(LONG_POLL_INTERVAL)
+        if engine.latest_event_seq(run_id) > after_seq:
+            return _offload(engine.get_events, run_id, after_seq)
+    return []
 
 
 @web.route('/runs/<run_id>/save')
 def run_save(run_id):
     """Save/download a run as zip archive."""
-    archive_path = engine.export_run(run_id)
-    if not archive_path:
+    engine = _ecr().engine
+    chunks = engine.iter_export_run(run_id)
+    if chunks is None:
         return "Run not found", 404
     
-    return send_file(
-        archive_path,
+    # Streamed while it is built, so the download starts immediately
+    return Response(
+        _offload_iter(chunks),
         mimetype='application/zip',
-        as_attachment=True,
-        download_name=os.path.basename(archive_path)
+        headers={
+            'Content-Disposition': f'attachment; filename="{run_id}.zip"',
+            # Keep nginx from spooling the whole archive before relaying it
+            'X-Accel-Buffering': 'no',
+        }
     )
 
 
 @web.route('/runs/<run_id>/export')
 def run_export(run_id):
     """Export a run as HTML report."""
+    engine = _ecr().engine
     ctx = engine.get_run_context(run_id)
     if not ctx:
         return "Run not found", 404
     
-    events = engine.get_events(run_id)
+    events = _offload(engine.get_events, run_id)
     html = generate_html_report(ctx, events)
     
-    report_path = os.path.join(ctx.storage.run_dir, f'report_{ctx.run_id}.html')
-    with open(report_path, 'w', encoding='utf-8') as f:
-        f.write(html)
+    # Keep a copy with the run, written off the request path
+    engine.save_report(run_id, html)
     
-    return send_file(
-        report_path,
+    return Response(
+        html,
         mimetype='text/html',
-        as_attachment=True,
-        download_name=f'ecr_report_{ctx.run_id}.html'
+        headers={'Content-Disposition': f'attachment; filename="ecr_report_{ctx.run_id}.html"'}
     )
 
 
-def generate_html_report(ctx, events):
-    """Generate a standalone HTML report for a run."""
-    manifest = ctx.manifest
-    
-    # Build terminal-style event log (chronological order - old to new)
-    event_html = []
-    for e in events:  # events are already in chronological order
-        if e['type'] == 'command_started':
-            loc = e['data'].get('run_location', 'host')
-            cmd_name = e['data'].get('command_name', '')
-            cmd = e['data'].get('command', '')
-            event_html.append(f'''
+# ---- Report event renderers: (event, time, data) -> HTML ----
+
+def _render_command_started(e, ts, data):
+    loc = escape(data.get('run_location', 'host'))
+    return f'''
                 <div class="term-prompt">
-                    <span class="term-time">{e["timestamp"][11:19]}</span>
+                    <span class="term-time">{ts}</span>
                     <span class="term-loc" style="background:{'#d29922' if loc=='target' else '#238636'}">{loc}</span>
-                    <span class="term-name">{cmd_name}</span>
-                    <span class="term-cmd">$ {cmd}</span>
-                </div>''')
-        elif e['type'] in ('command_completed', 'command_failed'):
-            is_error = e['type'] == 'command_failed'
-            stdout = e['data'].get('stdout', '')
-            stderr = e['data'].get('stderr', '')
-            exit_code = e['data'].get('exit_code', 0)
-            duration = e['data'].get('duration', 0)
-            event_html.append(f'''
+                    <span class="term-name">{escape(data.get('command_name', ''))}</span>
+                    <span class="term-cmd">$ {escape(data.get('command', ''))}</span>
+                </div>'''
+
+
+def _render_command_done(e, ts, data):
+    is_error = e['type'] == 'command_failed'
+    stdout = escape(data.get('stdout', ''))
+    stderr = escape(data.get('stderr', ''))
+    return f'''
                 <div class="term-output {'term-error' if is_error else ''}">
                     {f'<pre>{stdout}</pre>' if stdout else ''}
                     {f'<pre class="stderr">{stderr}</pre>' if stderr else ''}
-                    <div class="term-status">{'✗' if is_error else '✓'} exit {exit_code} ({duration:.2f}s)</div>
-                </div>''')
-        elif e['type'] == 'collector_output':
-            event_html.append(f'''
+                    <div class="term-status">{'✗' if is_error else '✓'} exit {escape(data.get('exit_code', 0))} ({data.get('duration', 0):.2f}s)</div>
+                </div>'''
+
+
+def _render_collector_output(e, ts, data):
+    return f'''
                 <div class="term-collector">
-                    <span class="term-time">{e["timestamp"][11:19]}</span>
-                    <span class="term-badge">{e['data'].get('collector', '')}</span>
-                    <pre>{e['data'].get('stdout', '')}</pre>
-                </div>''')
-        elif e['type'] == 'note':
-            event_html.append(f'''
+                    <span class="term-time">{ts}</span>
+                    <span class="term-badge">{escape(data.get('collector', ''))}</span>
+                    <pre>{escape(data.get('stdout', ''))}</pre>
+                </div>'''
+
+
+def _render_note(e, ts, data):
+    return f'''
                 <div class="term-note">
-                    <span class="term-time">{e["timestamp"][11:19]}</span>
-                    📝 {e['data'].get('text', '')}
-                </div>''')
-        else:
-            css = ''
-            if 'started' in e['type']: css = 'info'
-            elif 'completed' in e['type'] or 'pulled' in e['type']: css = 'success'
-            elif 'failed' in e['type'] or 'error' in e['type']: css = 'error'
-            detail = e['data'].get('command_name', '') or e['data'].get('error', '')
-            event_html.append(f'''
+                    <span class="term-time">{ts}</span>
+                    📝 {escape(data.get('text', ''))}
+                </div>'''
+
+
+@lru_cache(maxsize=256)
+def _event_style(event_type):
+    """(css class, escaped label) for an event type; worked out once per type."""
+    css = ''
+    if 'started' in event_type: css = 'info'
+    elif 'completed' in event_type or 'pulled' in event_type: css = 'success'
+    elif 'failed' in event_type or 'error' in event_type: css = 'error'
+    return css, escape(event_type)
+
+
+def _render_event(e, ts, data):
+    """Fallback for event types without a dedicated renderer."""
+    css, etype = _event_style(e['type'])
+    detail = escape(data.get('command_name', '') or data.get('error', ''))
+    return f'''
                 <div class="term-event term-{css}">
-                    <span class="term-time">{e["timestamp"][11:19]}</span>
-                    <span class="term-type">{e['type']}</span>
+                    <span class="term-time">{ts}</span>
+                    <span class="term-type">{etype}</span>
                     {f'<span class="term-detail">{detail}</span>' if detail else ''}
-                </div>''')
-    
-    artifacts_html = "<p>No artifacts collected.</p>"
-    if manifest.artifacts:
-        artifacts_html = "<ul>" + "".join(
-            f'<li>{a.get("local_path", "unknown")} (from {a.get("remote_path", "unknown")})</li>'
-            for a in manifest.artifacts
-        ) + "</ul>"
+                </div>'''
+
+
+_EVENT_RENDERERS = {
+    'command_started': _render_command_started,
+    'command_completed': _render_command_done,
+    'command_failed': _render_command_done,
+    'collector_output': _render_collector_output,
+    'note': _render_note,
+}
+
+
+def _report_datetime(iso):
+    """'YYYY-MM-DD HH:MM:SS' from a stored ISO-8601 timestamp."""
+    # Slicing beats fromisoformat + strftime, and the stored format is fixed
+    return iso[:19].replace('T', ' ')
+
+
+def generate_html_report(ctx, events):
+    """Generate a standalone HTML report for a run."""
+    manifest = ctx.manifest
     
-    params_html = "<p>No parameters set.</p>"
-    if manifest.parameters:
-        params_html = "<table><tr><th>Name</th><th>Value</th></tr>" + "".join(
-            f'<tr><td>{k}</td><td><code>{v}</code></td></tr>'
-            for k, v in manifest.parameters.items()
-        ) + "</table>"
+    # Build terminal-style event log (chronological order - old to new)
+    event_html = [
+        _EVENT_RENDERERS.get(e['type'], _render_event)(e, e['timestamp'][11:19], e['data'])
+        for e in events
+    ]
     
     status_class = 'success' if manifest.status == 'completed' else 'warning'
-    completed_at = manifest.completed_at[:19].replace('T', ' ') if manifest.completed_at else 'N/A'
     
-    return f'''<!DOCTYPE html>
-<html lang="en">
-<head>
-    <meta charset="UTF-8">
-    <title>ECR Report - {manifest.name}</title>
-    <style>
-        :root {{ --bg:#0d1117; --bg-card:#161b22; --border:#30363d; --text:#e6edf3; --text-muted:#8b949e; --green:#3fb950; --red:#f85149; --blue:#58a6ff; }}
-        * {{ box-sizing:border-box; margin:0; padding:0; }}
-        body {{ font-family:-apple-system,BlinkMacSystemFont,'Segoe UI',Helvetica,Arial,sans-serif; background:var(--bg); color:var(--text); line-height:1.6; padding:24px; }}
-        .container {{ max-width:1200px; margin:0 auto; }}
-        h1 {{ font-size:28px; margin-bottom:8px; }}
-        h2 {{ font-size:18px; margin:24px 0 12px; color:var(--blue); }}
-        .subtitle {{ color:var(--text-muted); margin-bottom:24px; }}
-        .card {{ background:var(--bg-card); border:1px solid var(--border); border-radius:8px; padding:16px; margin-bottom:16px; }}
-        .grid {{ display:grid; grid-template-columns:repeat(3,1fr); gap:16px; }}
-        .badge {{ display:inline-block; padding:4px 8px; border-radius:12px; font-size:12px; }}
-        .badge-success {{ background:rgba(63,185,80,0.2); color:var(--green); }}
-        .badge-warning {{ background:rgba(210,153,34,0.2); color:#d29922; }}
-        table {{ width:100%; border-collapse:collapse; margin-top:12px; }}
-        th,td {{ padding:8px 12px; text-align:left; border-bottom:1px solid var(--border); }}
-        th {{ color:var(--text-muted); font-size:12px; text-transform:uppercase; }}
-        code {{ background:var(--bg); padding:2px 6px; border-radius:4px; }}
-        ul {{ padding-left:20px; }}
-        .timestamp {{ font-size:12px; color:var(--text-muted); }}
-        
-        /* Terminal styles */
-        .terminal {{ font-family:'SF Mono',Monaco,'Consolas',monospace; font-size:12px; background:#0d1117; border-radius:6px; padding:12px; }}
-        .term-prompt {{ display:flex; align-items:center; gap:8px; color:#58a6ff; padding:4px 0; }}
-        .term-time {{ color:#6e7681; font-size:11px; min-width:60px; }}
-        .term-loc {{ color:#fff; padding:1px 6px; border-radius:3px; font-size:10px; text-transform:uppercase; }}
-        .term-name {{ color:#d2a8ff; font-weight:600; margin-right:8px; }}
-        .term-cmd {{ color:#c9d1d9; }}
-        .term-output {{ margin-left:68px; padding:8px 12px; background:#161b22; border-left:3px solid var(--green); border-radius:0 4px 4px 0; margin-bottom:8px; }}
-        .term-output.term-error {{ border-left-color:var(--red); }}
-        .term-output pre {{ margin:0; color:#c9d1d9; white-space:pre-wrap; word-break:break-all; background:none; padding:0; }}
-        .term-output pre.stderr {{ color:var(--red); }}
-        .term-status {{ margin-top:8px; font-size:11px; color:#8b949e; }}
-        .term-collector {{ display:flex; align-items:flex-start; gap:8px; padding:4px 0; color:#8b949e; }}
-        .term-collector pre {{ margin:0; flex:1; color:#8b949e; background:none; padding:0; }}
-        .term-badge {{ background:#6e40c9; color:#fff; padding:1px 6px; border-radius:3px; font-size:10px; }}
-        .term-note {{ padding:8px 12px; background:#1c2128; border-left:3px solid var(--blue); border-radius:0 4px 4px 0; color:#c9d1d9; margin-bottom:8px; }}
-        .term-event {{ display:flex; align-items:center; gap:8px; padding:4px 0; color:#8b949e; }}
-        .term-type {{ font-weight:500; }}
-        .term-info .term-type {{ color:var(--blue); }}
-        .term-success .term-type {{ color:var(--green); }}
-        .term-error .term-type {{ color:var(--red); }}
-        .term-detail {{ color:#6e7681; }}
-    </style>
-</head>
-<body>
-    <div class="container">
-        <h1>ECR Experiment Report</h1>
-        <p class="subtitle">{manifest.name} - {manifest.profile_name}</p>
-        <div class="grid">
-            <div class="card"><strong>Status</strong><br><span class="badge badge-{status_class}">{manifest.status.upper()}</span></div>
-            <div class="card"><strong>Created</strong><br><span class="timestamp">{manifest.created_at[:19].replace("T", " ")}</span></div>
-            <div class="card"><strong>Completed</strong><br><span class="timestamp">{completed_at}</span></div>
-        </div>
-        <h2>Parameters</h2>
-        <div class="card">{params_html}</div>
-        <h2>Artifacts</h2>
-        <div class="card">{artifacts_html}</div>
-        <h2>Event Log ({len(events)} events)</h2>
-        <div class="card">
-            <div class="terminal">{''.join(event_html)}</div>
-        </div>
-        <p class="timestamp" style="margin-top:24px; text-align:center;">Generated by ECR - {datetime.now().strftime("%Y-%m-%d %H:%M:%S")}</p>
-    </div>
-</body>
-</html>'''
+    return render_template(
+        'report.html',
+        manifest=manifest,
+        status_class=status_class,
+        created_at=_report_datetime(manifest.created_at),
+        completed_at=_report_datetime(manifest.completed_at) if manifest.completed_at else 'N/A',
+        event_count=len(events),
+        event_html=Markup(''.join(event_html)),
+        generated_at=datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+    )
 
 
 @web.route('/api/runs/<run_id>', methods=['DELETE'])
 def run_delete(run_id):
     """Delete a run."""
-    success = engine.delete_run(run_id)
+    engine = _ecr().engine
+    success = _offload(engine.delete_run, run_id)
     return jsonify({'success': success})
 
 
 @web.route('/runs/<run_id>/artifacts/<path:artifact_path>')
 def run_artifact(run_id, artifact_path):
     """Download an artifact."""
+    storage_manager = _ecr().storage_manager
+    # get_run rejects ids like '.' that would resolve to runs_dir itself
     storage = storage_manager.get_run(run_id)
-    if not storage:
+    if storage is None:
         return "Run not found", 404
     
-    full_path = os.path.join(storage.run_dir, artifact_path)
-    if not os.path.exists(full_path):
+    # Links carry the manifest's run-relative path ('artifacts/<name>');
+    # only files under the run's artifacts dir are served
+    prefix = 'artifacts/'
+    if not artifact_path.startswith(prefix):
         return "Artifact not found", 404
-    
-    return send_file(full_path, as_attachment=True)
+    # safe_join rejects '..' in the name, and a missing file is a plain
+    # 404. Artifact names are unique within a run and never rewritten.
+    return send_from_directory(
+        storage.artifacts_dir, artifact_path[len(prefix):],
+        as_attachment=True, max_age=ARTIFACT_MAX_AGE
+    )